@@ -9,9 +9,11 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, List
 from functools import lru_cache
 
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, Depends, HTTPException, status, Body, BackgroundTasks
 from fastapi.security import HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 import jwt
 from passlib.context import CryptContext
@@ -32,6 +34,34 @@ JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRES_MINUTES = int(os.getenv("JWT_EXPIRES_MINUTES", "15"))
 JWT_REFRESH_EXPIRES_DAYS = int(os.getenv("JWT_REFRESH_EXPIRES_DAYS", "7"))
 CATALOG_PDF_URL = os.getenv("CATALOG_PDF_URL", "https://dolmen.com/catalogo.pdf")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+RAG_PARALLEL_RETRIEVAL = os.getenv("RAG_PARALLEL_RETRIEVAL", "false").lower() == "true"
+FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", "0.85"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR") or None
+LOCAL_VECTOR_MODE = os.getenv("LOCAL_VECTOR_MODE", "fallback")
+VECTOR_IVF_LISTS = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_FIRST_PASS_DIMS = int(os.getenv("VECTOR_FIRST_PASS_DIMS", "0")) or None
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+PRODUCT_MATCH_THRESHOLD = float(os.getenv("PRODUCT_MATCH_THRESHOLD", "0"))
+HYBRID_SEARCH_RPC = os.getenv("HYBRID_SEARCH_RPC", "false").lower() == "true"
+RAG_HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "false").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def parse_field_weights(value: str) -> Optional[Dict[str, float]]:
+    """Pesos por campo desde "nombre=3,categoria=1.5,..." (vacío = por defecto)."""
+    if not value.strip():
+        return None
+    weights = {}
+    for item in value.split(","):
+        field, _, weight = item.partition("=")
+        weights[field.strip()] = float(weight)
+    return weights
+
+
+BM25_FIELD_WEIGHTS = parse_field_weights(os.getenv("BM25_FIELD_WEIGHTS", ""))
 
 # Contexto de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -57,7 +87,25 @@ app.add_middleware(
 
 # Clientes
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-rag_pipeline = HybridRAGPipeline(SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY)
+rag_pipeline = HybridRAGPipeline(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    OPENAI_API_KEY,
+    semantic_cache_threshold=SEMANTIC_CACHE_THRESHOLD,
+    parallel_retrieval=RAG_PARALLEL_RETRIEVAL,
+    faq_min_confidence=FAQ_MIN_CONFIDENCE,
+    vector_snapshot_dir=VECTOR_SNAPSHOT_DIR,
+    local_vector_mode=LOCAL_VECTOR_MODE,
+    vector_ivf_lists=VECTOR_IVF_LISTS,
+    vector_quantization=VECTOR_QUANTIZATION,
+    vector_first_pass_dims=VECTOR_FIRST_PASS_DIMS,
+    embedding_dimensions=EMBEDDING_DIMENSIONS,
+    product_match_threshold=PRODUCT_MATCH_THRESHOLD,
+    hybrid_search_rpc=HYBRID_SEARCH_RPC,
+    hybrid_retrieval=RAG_HYBRID_RETRIEVAL,
+    bm25_field_weights=BM25_FIELD_WEIGHTS,
+    rrf_k=RRF_K,
+)
 
 # ===================== MODELOS =====================
 class LoginRequest(BaseModel):
@@ -78,6 +126,7 @@ class RefreshRequest(BaseModel):
 
 class QueryRequest(BaseModel):
     pregunta: str = Field(..., description="Pregunta del cliente sobre productos")
+    top_k: int = Field(3, ge=1, le=20, description="Productos a usar como contexto (más = mayor latencia)")
 
 
 class ProductoRecomendado(BaseModel):
@@ -96,9 +145,27 @@ class QueryResponse(BaseModel):
     producto_recomendado: Optional[ProductoRecomendado] = None
     pdf_link: Optional[str] = None
     confianza: float
+    cached: bool = False  # True si se sirvió desde la cache de respuestas
     timestamp: str
 
 
+class BatchQueryRequest(BaseModel):
+    preguntas: List[str] = Field(..., min_length=1, max_length=500, description="Preguntas a procesar")
+    top_k: int = Field(3, ge=1, le=20, description="Productos a usar como contexto")
+
+
+class BatchQueryItem(BaseModel):
+    pregunta: str
+    resultado: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    resultados: List[BatchQueryItem]
+    total: int
+    errores: int
+
+
 class TokenPayload(BaseModel):
     sub: str  # user_id
     local_id: str
@@ -277,9 +344,57 @@ async def logout(current_user: TokenPayload = Depends(get_current_user)):
 
 
 # ===================== ENDPOINTS RAG =====================
+def build_producto_recomendado(producto: Optional[Dict]) -> Optional[ProductoRecomendado]:
+    """Convierte el producto del pipeline al modelo de la API."""
+    if not producto:
+        return None
+    return ProductoRecomendado(
+        id=producto["product_id"],
+        nombre=producto["nombre"],
+        categoria=producto["categoria"],
+        variantes=producto.get("variantes", []),
+        usos=producto.get("usos", []),
+        beneficios=producto.get("beneficios", []),
+        pdf_link=producto.get("pdf_link"),
+    )
+
+
+def build_query_response(rag_response: RAGResponse) -> QueryResponse:
+    """Convierte un RAGResponse del pipeline al modelo de respuesta de la API."""
+    return QueryResponse(
+        respuesta=rag_response.respuesta,
+        fuente=rag_response.fuente,
+        producto_recomendado=build_producto_recomendado(rag_response.producto_recomendado),
+        pdf_link=rag_response.pdf_link or CATALOG_PDF_URL,
+        confianza=rag_response.confianza,
+        cached=rag_response.cached,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+def save_query_log(user_id: str, local_id: str, pregunta: str, respuesta: str):
+    """
+    Guarda el log de una consulta en Supabase (no es crítico si falla).
+    Se ejecuta como background task para no bloquear la respuesta.
+    """
+    try:
+        log_entry = {
+            "user_id": user_id,
+            "local_id": local_id,
+            "query": pregunta,
+            "response": respuesta,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        supabase.table("logs").insert(log_entry).execute()
+    except Exception as log_error:
+        # Si no existe tabla logs, simplemente continuar
+        print(f"Nota: No se pudo guardar log: {str(log_error)}")
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query(
     request: QueryRequest,
+    background_tasks: BackgroundTasks,
     current_user: TokenPayload = Depends(get_current_user)
 ):
     """
@@ -293,44 +408,22 @@ async def query(
         Respuesta RAG con referencias a PDF
     """
     try:
-        # Ejecutar pipeline RAG
-        rag_response = rag_pipeline.query(request.pregunta, current_user.local_id)
-        
-        # Preparar respuesta con producto recomendado
-        producto_recomendado = None
-        if rag_response.producto_recomendado:
-            producto_recomendado = ProductoRecomendado(
-                id=rag_response.producto_recomendado["product_id"],
-                nombre=rag_response.producto_recomendado["nombre"],
-                categoria=rag_response.producto_recomendado["categoria"],
-                variantes=rag_response.producto_recomendado.get("variantes", []),
-                usos=rag_response.producto_recomendado.get("usos", []),
-                beneficios=rag_response.producto_recomendado.get("beneficios", []),
-                pdf_link=rag_response.producto_recomendado.get("pdf_link"),
-            )
-        
-        # Intentar guardar log en Supabase (no es crítico si falla)
-        try:
-            log_entry = {
-                "user_id": current_user.sub,
-                "local_id": current_user.local_id,
-                "query": request.pregunta,
-                "response": rag_response.respuesta,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
-            supabase.table("logs").insert(log_entry).execute()
-        except Exception as log_error:
-            # Si no existe tabla logs, simplemente continuar
-            print(f"Nota: No se pudo guardar log: {str(log_error)}")
+        # Ejecutar pipeline RAG (asíncrono: no bloquea el event loop)
+        rag_response = await rag_pipeline.aquery(
+            request.pregunta,
+            current_user.local_id,
+            top_k=request.top_k,
+        )
         
-        return QueryResponse(
-            respuesta=rag_response.respuesta,
-            fuente=rag_response.fuente,
-            producto_recomendado=producto_recomendado,
-            pdf_link=rag_response.pdf_link or CATALOG_PDF_URL,
-            confianza=rag_response.confianza,
-            timestamp=datetime.now(timezone.utc).isoformat(),
+        background_tasks.add_task(
+            save_query_log,
+            current_user.sub,
+            current_user.local_id,
+            request.pregunta,
+            rag_response.respuesta,
         )
+        
+        return build_query_response(rag_response)
     
     except Exception as e:
         print(f"Error en query: {str(e)}")
@@ -342,6 +435,115 @@ async def query(
         )
 
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(
+    request: BatchQueryRequest,
+    current_user: TokenPayload = Depends(get_current_user)
+):
+    """
+    Procesa un lote de preguntas (herramientas de back-office: pre-calentar
+    cache, auditorías). Los embeddings se piden en una sola llamada y la
+    generación corre con concurrencia acotada.
+    
+    Returns:
+        Un resultado por pregunta, en el mismo orden; los errores individuales
+        se reportan en `error` sin hacer fallar el lote
+    """
+    responses = await rag_pipeline.abatch_query(
+        request.preguntas,
+        current_user.local_id,
+        top_k=request.top_k,
+        max_concurrency=BATCH_MAX_CONCURRENCY,
+    )
+    
+    resultados = []
+    for pregunta, rag_response in zip(request.preguntas, responses):
+        if isinstance(rag_response, Exception):
+            print(f"Error en query/batch ({pregunta}): {str(rag_response)}")
+            resultados.append(BatchQueryItem(
+                pregunta=pregunta,
+                error=f"Error procesando la pregunta: {str(rag_response)}",
+            ))
+            continue
+        try:
+            resultados.append(BatchQueryItem(
+                pregunta=pregunta,
+                resultado=build_query_response(rag_response),
+            ))
+        except Exception as e:
+            resultados.append(BatchQueryItem(pregunta=pregunta, error=f"Error procesando la pregunta: {str(e)}"))
+    
+    return BatchQueryResponse(
+        resultados=resultados,
+        total=len(resultados),
+        errores=sum(1 for r in resultados if r.error),
+    )
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream(
+    request: QueryRequest,
+    current_user: TokenPayload = Depends(get_current_user)
+):
+    """
+    Igual que /query pero en streaming (Server-Sent Events).
+    
+    Eventos:
+        meta: fuente, producto_recomendado, pdf_link y confianza (apenas termina la recuperación)
+        token: fragmento de texto de la respuesta
+        done: fin de la respuesta (incluye timestamp)
+        error: detalle del error
+    """
+    parts: List[str] = []
+    
+    async def event_stream():
+        try:
+            async for event in rag_pipeline.astream_query(
+                request.pregunta,
+                current_user.local_id,
+                top_k=request.top_k,
+            ):
+                if event["type"] == "meta":
+                    producto = build_producto_recomendado(event["producto_recomendado"])
+                    yield sse_event("meta", {
+                        "fuente": event["fuente"],
+                        "producto_recomendado": producto.model_dump() if producto else None,
+                        "pdf_link": event["pdf_link"] or CATALOG_PDF_URL,
+                        "confianza": event["confianza"],
+                        "cached": event["cached"],
+                    })
+                elif event["type"] == "token":
+                    parts.append(event["content"])
+                    yield sse_event("token", {"content": event["content"]})
+                else:
+                    yield sse_event("done", {"timestamp": datetime.now(timezone.utc).isoformat()})
+        except Exception as e:
+            print(f"Error en query/stream: {str(e)}")
+            yield sse_event("error", {"detail": f"Error procesando la pregunta: {str(e)}"})
+    
+    # El log se guarda al terminar el stream, con la respuesta completa
+    log_task = BackgroundTask(
+        lambda: save_query_log(
+            current_user.sub,
+            current_user.local_id,
+            request.pregunta,
+            "".join(parts),
+        )
+    )
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=log_task,
+    )
+
+
 # ===================== ENDPOINTS DE UTILIDAD =====================
 @app.get("/health")
 async def health_check():
@@ -373,6 +575,24 @@ async def get_current_user_info(current_user: TokenPayload = Depends(get_current
     }
 
 
+@app.get("/cache/stats")
+async def get_cache_stats(current_user: TokenPayload = Depends(get_current_user)):
+    """
+    Retorna hits/misses y tamaño de las caches del pipeline RAG.
+    """
+    return rag_pipeline.cache_stats()
+
+
+@app.post("/cache/invalidate")
+async def invalidate_cache(current_user: TokenPayload = Depends(get_current_user)):
+    """
+    Descarta las respuestas cacheadas del local del usuario.
+    Usar después de re-ingestar catálogo o FAQs en Supabase.
+    """
+    removed = rag_pipeline.invalidate_cache(current_user.local_id)
+    return {"message": "Cache invalidada", "local_id": current_user.local_id, "eliminadas": removed}
+
+
 @app.get("/catalog/pdf")
 async def get_catalog_pdf_url():
     """
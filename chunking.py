@@ -0,0 +1,193 @@
+"""
+Chunking compartido por la ingesta y el pipeline RAG.
+
+Divide textos en límites de campo/oración con tamaño medido en tokens
+(tiktoken, codificación de text-embedding-3-small), sin cortar palabras y de
+forma determinística: el mismo texto con los mismos parámetros produce
+siempre los mismos chunks, así que sus hashes de contenido son estables.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Codificación de text-embedding-3-small / gpt-4o-mini (cl100k_base)
+TOKENIZER = os.getenv("CHUNK_TOKENIZER", "cl100k_base")
+DEFAULT_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))
+# Versión del algoritmo (forma parte del hash de contenido de los chunks)
+CHUNKER_VERSION = 1
+
+# Fin de oración: . ! ? ; o salto de línea, seguido de espacio
+_SENTENCE_END = re.compile(r"(?<=[.!?;…])\s+|\n+")
+_FIELD_SEPARATOR = "\n"
+
+
+@lru_cache(maxsize=1)
+def _encoder() -> Tuple[str, Optional[Callable[[str], List[int]]]]:
+    """
+    Codificador de tiktoken (se carga una sola vez). Si tiktoken o su
+    codificación no están disponibles se usa una estimación por caracteres;
+    el nombre devuelto distingue ambos casos para que los hashes no se mezclen.
+    """
+    try:
+        import tiktoken
+
+        return TOKENIZER, tiktoken.get_encoding(TOKENIZER).encode
+    except Exception:
+        return "chars/4", None
+
+
+def tokenizer_name() -> str:
+    """Nombre del contador de tokens en uso."""
+    return _encoder()[0]
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Cantidad de tokens de un texto (tiktoken o estimación ~4 caracteres/token)."""
+    encode = _encoder()[1]
+    if encode is not None:
+        return len(encode(text))
+    return (len(text) + 3) // 4
+
+
+def chunk_params(max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Dict:
+    """Parámetros que determinan los chunks (para incluir en hashes de contenido)."""
+    return {
+        "chunker": CHUNKER_VERSION,
+        "tokenizer": tokenizer_name(),
+        "max_tokens": max_tokens,
+        "overlap_tokens": overlap_tokens,
+    }
+
+
+def split_sentences(text: str) -> List[str]:
+    """Divide un texto en oraciones (sin perder ni reordenar contenido)."""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _split_words(text: str, max_tokens: int) -> List[str]:
+    """Parte una oración demasiado larga en tramos de palabras completas."""
+    pieces: List[str] = []
+    current: List[str] = []
+    for word in text.split():
+        candidate = " ".join(current + [word])
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(" ".join(current))
+            current = [word]
+        else:
+            current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _units(text: str, max_tokens: int) -> List[str]:
+    """Oraciones de un texto, partiendo por palabras las que no entran en un chunk."""
+    units: List[str] = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) <= max_tokens:
+            units.append(sentence)
+        else:
+            units.extend(_split_words(sentence, max_tokens))
+    return units
+
+
+def _pack(units: Sequence[str], max_tokens: int, overlap_tokens: int, separator: str) -> List[str]:
+    """
+    Agrupa unidades (oraciones/campos) en chunks de hasta `max_tokens`,
+    repitiendo al inicio de cada chunk las últimas unidades del anterior
+    mientras sumen a lo sumo `overlap_tokens`.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            # Solapamiento: unidades completas del final del chunk anterior
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = count_tokens(previous)
+                if overlap_size + size > overlap_tokens or overlap_size + size + tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[str]:
+    """
+    Divide un texto en chunks por oraciones.
+
+    Args:
+        text: Texto a dividir
+        max_tokens: Tamaño máximo de cada chunk (tokens)
+        overlap_tokens: Tokens (en oraciones completas) repetidos entre chunks
+
+    Returns:
+        Lista de chunks (al menos uno, aunque el texto esté vacío)
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text.strip()]
+    return _pack(_units(text, max_tokens), max_tokens, overlap_tokens, " ")
+
+
+def chunk_fields(
+    fields: Sequence[Tuple[str, str]],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    header: str = "",
+) -> List[str]:
+    """
+    Divide un registro con campos etiquetados ("Producto: ...", "Usos: ...")
+    respetando los límites de campo: los campos cortos se agrupan enteros y
+    solo los que no entran en un chunk se parten por oraciones.
+
+    Args:
+        fields: Pares (etiqueta, valor); los valores vacíos se omiten
+        max_tokens: Tamaño máximo de cada chunk (tokens, incluido el encabezado)
+        overlap_tokens: Tokens (en unidades completas) repetidos entre chunks
+        header: Línea repetida al inicio de cada chunk (ej: "Producto: X") para
+            que ningún chunk pierda a qué registro pertenece
+
+    Returns:
+        Lista de chunks
+    """
+    if header:
+        max_tokens = max(1, max_tokens - count_tokens(header) - 1)
+    units: List[str] = []
+    for label, value in fields:
+        value = str(value or "").strip()
+        if not value:
+            continue
+        field = f"{label}: {value}"
+        if count_tokens(field) <= max_tokens:
+            units.append(field)
+        else:
+            units.extend(_units(field, max_tokens))
+    chunks = _pack(units, max_tokens, overlap_tokens, _FIELD_SEPARATOR) if units else [""]
+    if header:
+        chunks = [f"{header}{_FIELD_SEPARATOR}{chunk}" if chunk else header for chunk in chunks]
+    return chunks
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Primer chunk de un texto: lo recorta a `max_tokens` sin cortar oraciones ni palabras."""
+    # Un token de tiktoken nunca ocupa menos de un byte: textos cortos no se tokenizan
+    if len(text.encode("utf-8")) <= max_tokens:
+        return text
+    return chunk_text(text, max_tokens=max_tokens, overlap_tokens=0)[0]
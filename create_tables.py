@@ -11,6 +11,9 @@ load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Parámetros de los índices HNSW (más altos = mejor recall, construcción más lenta)
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     print("❌ Error: SUPABASE_URL o SUPABASE_KEY no configurados")
@@ -18,46 +21,37 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 print(f"🔗 Conectando a Supabase: {SUPABASE_URL}")
 
-# SQL para crear las tablas
-SQL_COMMANDS = [
-    # Habilitar extensión pgvector
-    "CREATE EXTENSION IF NOT EXISTS vector",
-    
-    # Tabla FAQs
-    """CREATE TABLE IF NOT EXISTS faqs (
-    id BIGSERIAL PRIMARY KEY,
-    faq_id VARCHAR(50) NOT NULL UNIQUE,
-    pregunta VARCHAR(500) NOT NULL,
-    respuesta TEXT NOT NULL,
-    categoria VARCHAR(100),
-    palabras_clave TEXT[],
-    productos_relacionados VARCHAR(50)[],
-    pdf_link VARCHAR(500),
-    embedding VECTOR(1536),
-    created_at TIMESTAMP DEFAULT NOW()
-)""",
-    
-    # Tabla Products
-    """CREATE TABLE IF NOT EXISTS products (
-    id BIGSERIAL PRIMARY KEY,
-    product_id VARCHAR(50) NOT NULL,
-    nombre VARCHAR(255) NOT NULL,
-    categoria VARCHAR(100),
-    subcategoria VARCHAR(100),
-    descripcion TEXT,
-    variantes TEXT[],
-    usos TEXT[],
-    beneficios TEXT[],
-    chunk_index INTEGER,
-    chunk_text TEXT,
-    embedding VECTOR(1536),
-    created_at TIMESTAMP DEFAULT NOW()
-)""",
-    
-    # Índices
-    "CREATE INDEX IF NOT EXISTS idx_faqs_embedding ON faqs USING ivfflat (embedding vector_cosine_ops)",
-    "CREATE INDEX IF NOT EXISTS idx_products_embedding ON products USING ivfflat (embedding vector_cosine_ops)",
-]
+# Esquema, índices y funciones de búsqueda (RPC): versionados en migrations/
+# (NNN_nombre.sql, idempotentes, cada una se registra en schema_migrations)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Parámetros HNSW con los que están escritas las migraciones (ver 002)
+HNSW_DEFAULTS = (
+    ("m = 16, ef_construction = 64", "m = {m}, ef_construction = {ef}"),
+    ("p_m int DEFAULT 16", "p_m int DEFAULT {m}"),
+    ("p_ef_construction int DEFAULT 64", "p_ef_construction int DEFAULT {ef}"),
+)
+
+
+def apply_hnsw_params(sql, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION):
+    """Reemplaza los parámetros HNSW por defecto de una migración"""
+    for default, template in HNSW_DEFAULTS:
+        sql = sql.replace(default, template.format(m=m, ef=ef_construction))
+    return sql
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Contenido de las migraciones en orden de versión (una por comando)"""
+    commands = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".sql"):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            commands.append(apply_hnsw_params(f.read().strip().rstrip(";")))
+    return commands
+
+
+SQL_COMMANDS = load_migrations()
 
 headers = {
     "apikey": SUPABASE_KEY,
@@ -82,7 +76,7 @@ def execute_sql(sql):
     except Exception as e:
         return False, str(e)
 
-print("\n📦 Creando tablas y extensiones...\n")
+print("\n📦 Aplicando migraciones (tablas, índices y funciones)...\n")
 
 for i, sql in enumerate(SQL_COMMANDS, 1):
     sql_short = sql.split('\n')[0][:50]
@@ -92,7 +86,7 @@ for i, sql in enumerate(SQL_COMMANDS, 1):
         print(f"  ✅ {i}. {sql_short}...")
     else:
         # No es error crítico si ya existen
-        if "already exists" in msg or "EXTENSION" in sql:
+        if "already exists" in msg:
             print(f"  ⚠️  {i}. {sql_short}... (ya existe o no disponible)")
         else:
             print(f"  ❌ {i}. {sql_short}...\n     Error: {msg}")
@@ -102,6 +96,6 @@ print("\n📝 Alternativa: Si los comandos SQL no funcionaron,")
 print("   ve a https://app.supabase.com → SQL Editor")
 print("   y copia-pega este SQL manualmente:")
 print("\n" + "="*60)
-for sql in SQL_COMMANDS[1:]:
+for sql in SQL_COMMANDS:
     print(sql + ";")
 print("="*60)
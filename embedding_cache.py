@@ -0,0 +1,113 @@
+"""
+Cache persistente de embeddings en disco (SQLite).
+
+Clave: sha256(modelo + texto). Valor: vector float32. Así un run de ingesta
+que se cae a mitad de camino, o una sincronización incremental, solo paga
+por los textos que nunca se embebieron con ese modelo.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Cache de embeddings en SQLite, segura para usar desde varios hilos."""
+
+    def __init__(self, path: str, model: str):
+        """
+        Args:
+            path: Archivo SQLite (se crea si no existe)
+            model: Modelo de embeddings (parte de la clave)
+        """
+        self.path = path
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, List[float]]:
+        """
+        Busca embeddings ya calculados.
+
+        Returns:
+            Diccionario {posición en `texts`: embedding} con los aciertos
+        """
+        keys = [self._key(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite limita la cantidad de parámetros por sentencia
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            hits = {idx: found[key] for idx, key in enumerate(keys) if key in found}
+            self.hits += len(hits)
+            self.misses += len(keys) - len(hits)
+        return hits
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Guarda embeddings recién generados."""
+        rows = [
+            (self._key(text), self.model, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def wrap(self, embed_fn: Callable[[List[str]], List[List[float]]]) -> Callable[[List[str]], List[List[float]]]:
+        """
+        Envuelve una función de embeddings por lotes: consulta la cache y solo
+        envía a `embed_fn` los textos que faltan (guardándolos al volver).
+        """
+        def cached_embed(texts: List[str]) -> List[List[float]]:
+            vectors: List[Optional[List[float]]] = [None] * len(texts)
+            for idx, vector in self.get_many(texts).items():
+                vectors[idx] = vector
+            missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+            if missing:
+                new_vectors = embed_fn([texts[idx] for idx in missing])
+                self.put_many([texts[idx] for idx in missing], new_vectors)
+                for idx, vector in zip(missing, new_vectors):
+                    vectors[idx] = vector
+            return vectors
+
+        return cached_embed
+
+    def stats(self) -> Dict:
+        """Aciertos y fallos desde que se abrió la cache."""
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
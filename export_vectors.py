@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Exporta los embeddings de Supabase a snapshots locales (uno por local_id)
+para el índice vectorial en proceso del pipeline RAG (ver vector_index.py).
+
+Uso:
+    python export_vectors.py --local-id LOCAL_001 --out vector_snapshots
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ingest import FETCH_PAGE_SIZE, embedding_model_id, get_supabase
+from vector_index import save_snapshot
+
+DEFAULT_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "vector_snapshots")
+
+FAQ_COLUMNS = "faq_id,pregunta,respuesta,categoria,pdf_link,embedding"
+PRODUCT_COLUMNS = (
+    "product_id,chunk_index,nombre,categoria,descripcion,variantes,usos,beneficios,pdf_link,stock,embedding"
+)
+
+
+def fetch_rows(table: str, columns: str, local_id: str) -> List[Dict]:
+    """Lee (paginado) las filas de un local con su embedding."""
+    rows: List[Dict] = []
+    start = 0
+    while True:
+        response = (
+            get_supabase().table(table)
+            .select(columns)
+            .eq("local_id", local_id)
+            .order("id")
+            .range(start, start + FETCH_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < FETCH_PAGE_SIZE:
+            return rows
+        start += FETCH_PAGE_SIZE
+
+
+def parse_embedding(value) -> Optional[List[float]]:
+    """PostgREST devuelve los vectores de pgvector como texto '[0.1,...]'."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def faq_payload(row: Dict) -> Dict:
+    """Fila de `faqs` en el formato que usa el pipeline."""
+    return {
+        "id": row["faq_id"],
+        "question": row.get("pregunta"),
+        "answer": row.get("respuesta"),
+        "category": row.get("categoria"),
+        "pdf_link": row.get("pdf_link"),
+    }
+
+
+def product_payload(row: Dict) -> Dict:
+    """Chunk de `products` en el formato que usa el pipeline."""
+    return {
+        "id": row["product_id"],
+        "product_id": row["product_id"],
+        "chunk_index": row.get("chunk_index", 0),
+        "nombre": row.get("nombre"),
+        "categoria": row.get("categoria"),
+        "descripcion": row.get("descripcion") or "",
+        "variantes": row.get("variantes") or [],
+        "usos": row.get("usos") or [],
+        "beneficios": row.get("beneficios") or [],
+        "pdf_link": row.get("pdf_link"),
+        "stock": row.get("stock", True),
+    }
+
+
+def export_local(local_id: str, out_dir: str) -> Tuple[int, int]:
+    """
+    Exporta el snapshot de un local.
+
+    Returns:
+        (FAQs exportadas, chunks de productos exportados)
+    """
+    tables = {}
+    for table, columns, to_payload in (
+        ("faqs", FAQ_COLUMNS, faq_payload),
+        ("products", PRODUCT_COLUMNS, product_payload),
+    ):
+        embeddings, payloads = [], []
+        for row in fetch_rows(table, columns, local_id):
+            if table == "products" and not row.get("stock", True):
+                continue  # search_products solo devuelve productos en stock
+            embedding = parse_embedding(row.get("embedding"))
+            if embedding is None:
+                continue
+            embeddings.append(embedding)
+            payloads.append(to_payload(row))
+        tables[table] = (embeddings, payloads)
+
+    os.makedirs(out_dir, exist_ok=True)
+    save_snapshot(os.path.join(out_dir, f"{local_id}.npz"), tables, embedding_model_id())
+    return len(tables["faqs"][1]), len(tables["products"][1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Exporta embeddings de Supabase a snapshots locales.")
+    parser.add_argument("--local-id", action="append", dest="local_ids",
+                        help="ID del local (repetible; por defecto LOCAL_001)")
+    parser.add_argument("--out", default=DEFAULT_SNAPSHOT_DIR, help="Directorio de snapshots")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for local_id in args.local_ids or ["LOCAL_001"]:
+        started = time.monotonic()
+        try:
+            faqs, chunks = export_local(local_id, args.out)
+            print(f"✓ {local_id}: {faqs} FAQs, {chunks} chunks de productos "
+                  f"({time.monotonic() - started:.1f}s) → {os.path.join(args.out, local_id + '.npz')}")
+        except Exception as e:
+            print(f"✗ {local_id}: {str(e)}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ Chat interactivo con autenticación JWT y manejo de tokens
 """
 
 import os
+import json
 import requests
 import streamlit as st
 from datetime import datetime
@@ -102,27 +103,76 @@ def logout_user():
     st.session_state.chat_history = []
 
 
-def query_backend(pregunta: str) -> dict:
-    """Envía una pregunta al backend RAG."""
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/query",
-            json={"pregunta": pregunta},
-            headers={"Authorization": f"Bearer {st.session_state.access_token}"},
-            timeout=30
-        )
+def query_backend_stream(pregunta: str):
+    """
+    Envía una pregunta al endpoint de streaming del backend.
+    
+    Yields:
+        Tuplas (evento, datos) de Server-Sent Events: meta, token, done o error
+    """
+    with requests.post(
+        f"{BACKEND_URL}/query/stream",
+        json={"pregunta": pregunta},
+        headers={"Authorization": f"Bearer {st.session_state.access_token}"},
+        stream=True,
+        timeout=30
+    ) as response:
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("detail", "Error en servidor")
+            except ValueError:
+                detail = "Error en servidor"
+            yield "error", {"detail": detail}
+            return
         
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {
-                "error": response.json().get("detail", "Error en servidor"),
-                "status_code": response.status_code
-            }
-    except requests.exceptions.Timeout:
-        return {"error": "Timeout: El servidor tardó demasiado en responder"}
-    except Exception as e:
-        return {"error": f"Error de conexión: {str(e)}"}
+        event = "message"
+        for raw_line in response.iter_lines():
+            line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):])
+
+
+def stream_answer(pregunta: str) -> dict:
+    """
+    Muestra la respuesta del backend a medida que se genera.
+    
+    Returns:
+        Mensaje del asistente para el historial, o {"error": ...}
+    """
+    respuesta_data = {"role": "assistant", "content": ""}
+    
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        placeholder.markdown("🤔 Buscando respuesta...")
+        
+        try:
+            for event, data in query_backend_stream(pregunta):
+                if event == "meta":
+                    # La recuperación termina antes que la generación: referencias primero
+                    respuesta_data["fuente"] = data.get("fuente", "rag")
+                    respuesta_data["confianza"] = data.get("confianza", 0)
+                    respuesta_data["pdf_link"] = data.get("pdf_link")
+                    if data.get("producto_recomendado"):
+                        respuesta_data["producto"] = data["producto_recomendado"]
+                        st.caption(f"📦 Producto recomendado: {data['producto_recomendado']['nombre']}")
+                elif event == "token":
+                    respuesta_data["content"] += data.get("content", "")
+                    placeholder.markdown(respuesta_data["content"] + "▌")
+                elif event == "error":
+                    placeholder.empty()
+                    return {"error": data.get("detail", "Error en servidor")}
+        except requests.exceptions.Timeout:
+            placeholder.empty()
+            return {"error": "Timeout: El servidor tardó demasiado en responder"}
+        except Exception as e:
+            placeholder.empty()
+            return {"error": f"Error de conexión: {str(e)}"}
+        
+        placeholder.markdown(respuesta_data["content"])
+    
+    return respuesta_data
 
 
 # ===================== PÁGINA DE LOGIN =====================
@@ -236,22 +286,10 @@ def show_chat():
                         "content": faq['pregunta']
                     })
                     
-                    # Enviar al backend
-                    with st.spinner("🤔 Buscando respuesta..."):
-                        resultado = query_backend(faq['pregunta'])
+                    # Enviar al backend (respuesta en streaming)
+                    respuesta_data = stream_answer(faq['pregunta'])
                     
-                    if "error" not in resultado:
-                        respuesta_data = {
-                            "role": "assistant",
-                            "content": resultado["respuesta"],
-                            "fuente": resultado.get("fuente", "rag"),
-                            "confianza": resultado.get("confianza", 0),
-                            "pdf_link": resultado.get("pdf_link"),
-                        }
-                        
-                        if resultado.get("producto_recomendado"):
-                            respuesta_data["producto"] = resultado["producto_recomendado"]
-                        
+                    if "error" not in respuesta_data:
                         st.session_state.chat_history.append(respuesta_data)
                     
                     st.rerun()
@@ -305,25 +343,17 @@ def show_chat():
             "content": pregunta
         })
         
-        # Enviar al backend
-        with st.spinner("🤔 Buscando respuesta..."):
-            resultado = query_backend(pregunta)
+        # Mostrar la pregunta mientras llega la respuesta
+        with st.chat_message("user"):
+            st.write(pregunta)
         
-        if "error" in resultado:
-            st.error(f"❌ Error: {resultado['error']}")
+        # Enviar al backend (respuesta en streaming)
+        respuesta_data = stream_answer(pregunta)
+        
+        if "error" in respuesta_data:
+            st.error(f"❌ Error: {respuesta_data['error']}")
         else:
             # Agregar respuesta al historial
-            respuesta_data = {
-                "role": "assistant",
-                "content": resultado["respuesta"],
-                "fuente": resultado.get("fuente", "rag"),
-                "confianza": resultado.get("confianza", 0),
-                "pdf_link": resultado.get("pdf_link"),
-            }
-            
-            if resultado.get("producto_recomendado"):
-                respuesta_data["producto"] = resultado["producto_recomendado"]
-            
             st.session_state.chat_history.append(respuesta_data)
             st.rerun()
     
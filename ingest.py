@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+"""
+CLI de ingesta DOLMEN en Supabase (esquema de migrations/).
+
+Genera embeddings de productos y FAQs de forma incremental (solo lo que
+cambió según el hash de contenido) y concurrente (ver ingest_pipeline).
+
+Uso:
+    python ingest.py all --local-id LOCAL_001
+    python ingest.py products --catalog catalogo_jerarquia.json --batch-size 100 --concurrency 4
+    python ingest.py faqs --faqs faq_poc.json --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from supabase import create_client
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from chunking import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_fields, chunk_params, count_tokens
+from embedding_cache import EmbeddingCache
+from ingest_pipeline import Checkpoint, IngestStats, record_retry, run_pipeline
+
+# Cargar variables de entorno
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Dimensiones reducidas de los embeddings (0 = las del modelo, 1536); deben
+# coincidir con las columnas VECTOR(n) de Supabase y con el backend
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+# Máximo de textos por request de embeddings (la API acepta listas de inputs)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+# Presupuesto de tokens por request (la API limita el total de tokens por request)
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "200000"))
+# Filas por request de upsert a Supabase
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+# Requests concurrentes a OpenAI (embeddings) y a Supabase (upserts)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+WRITE_CONCURRENCY = int(os.getenv("WRITE_CONCURRENCY", "2"))
+# Parámetros de chunking en tokens (forman parte del hash de contenido)
+CHUNK_MAX_TOKENS = DEFAULT_MAX_TOKENS
+CHUNK_OVERLAP_TOKENS = DEFAULT_OVERLAP_TOKENS
+# Cache de embeddings en disco (vacío = desactivada)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite")
+# Registro de filas escritas (para retomar un run interrumpido) y reporte de fallos
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", ".ingest_checkpoint.jsonl")
+FAILURE_REPORT_PATH = os.getenv("INGEST_FAILURE_REPORT_PATH", "ingest_failures.json")
+# Filas por página al leer hashes existentes (Supabase limita a 1000 por request)
+FETCH_PAGE_SIZE = 1000
+
+DEFAULT_CATALOG_PATH = "catalogo_jerarquia.json"
+DEFAULT_FAQ_PATH = "faq_poc.json"
+DEFAULT_LOCAL_ID = "LOCAL_001"
+
+# Clave única de cada tabla (on_conflict de los upserts)
+FAQ_KEY = ("local_id", "faq_id")
+PRODUCT_KEY = ("local_id", "product_id", "chunk_index")
+
+# Clientes (se crean al primer uso: --dry-run sin OpenAI no los necesita)
+_supabase = None
+_openai_client = None
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_supabase():
+    """Cliente de Supabase (lazy)."""
+    global _supabase
+    if _supabase is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise RuntimeError("SUPABASE_URL o SUPABASE_KEY no configurados")
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+
+def get_openai():
+    """Cliente de OpenAI (lazy)."""
+    global _openai_client
+    if _openai_client is None:
+        if not OPENAI_API_KEY:
+            raise RuntimeError("OPENAI_API_KEY no configurado")
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    wait=wait_random_exponential(multiplier=1, max=60),
+    stop=stop_after_attempt(6),
+    before_sleep=record_retry,
+    reraise=True,
+)
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """Genera embeddings para un lote de textos en un solo request (con reintentos)."""
+    options = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+    response = get_openai().embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=texts,
+        **options
+    )
+    # La API indica el índice de cada input; no asumir el orden
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def embedding_model_id() -> str:
+    """Modelo de embeddings con sus dimensiones, si no son las por defecto."""
+    if EMBEDDING_DIMENSIONS:
+        return f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}"
+    return EMBEDDING_MODEL
+
+
+def open_embedding_cache(path: Optional[str]) -> Optional[EmbeddingCache]:
+    """Activa la cache de embeddings en disco (None o "" la desactiva)."""
+    global _embedding_cache
+    if _embedding_cache is not None:
+        _embedding_cache.close()
+    _embedding_cache = EmbeddingCache(path, embedding_model_id()) if path else None
+    return _embedding_cache
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """`embed_batch` consultando antes la cache en disco (si está activa)."""
+    if _embedding_cache is None:
+        return embed_batch(texts)
+    return _embedding_cache.wrap(embed_batch)(texts)
+
+
+def bulk_upsert(
+    table: str,
+    rows: List[Dict],
+    on_conflict: str,
+    batch_size: int = UPSERT_BATCH_SIZE,
+) -> int:
+    """
+    Upsert de muchas filas enviando arrays de hasta `batch_size` filas por request.
+    Idempotente: re-ingestar actualiza las filas existentes según `on_conflict`.
+
+    Returns:
+        Número de filas escritas
+    """
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            get_supabase().table(table).upsert(batch, on_conflict=on_conflict).execute()
+            written += len(batch)
+            print(f"  ✓ Upsert {table}: {written}/{len(rows)} filas")
+        except Exception as e:
+            print(f"  ✗ Error en upsert de {table} (filas {start}-{start + len(batch) - 1}): {str(e)}")
+    return written
+
+
+def content_hash(row: Dict, **params) -> str:
+    """
+    Hash estable del contenido de una fila (sin embedding ni timestamps) y de
+    los parámetros que la producen (modelo, chunking). Si no cambia, no hace
+    falta volver a generar el embedding ni a subir la fila.
+    """
+    payload = {
+        key: value for key, value in row.items()
+        if key not in ("embedding", "created_at", "content_hash")
+    }
+    payload["_params"] = {"model": embedding_model_id(), **params}
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def fetch_existing_hashes(table: str, key: Tuple[str, ...], local_id: str) -> Dict[tuple, str]:
+    """
+    Lee los hashes de contenido ya almacenados para un local.
+
+    Returns:
+        Diccionario {clave única: content_hash}
+    """
+    hashes: Dict[tuple, str] = {}
+    start = 0
+    while True:
+        response = (
+            get_supabase().table(table)
+            .select(",".join(key + ("content_hash",)))
+            .eq("local_id", local_id)
+            .order("id")
+            .range(start, start + FETCH_PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = response.data or []
+        for row in rows:
+            hashes[tuple(row[column] for column in key)] = row.get("content_hash")
+        if len(rows) < FETCH_PAGE_SIZE:
+            return hashes
+        start += FETCH_PAGE_SIZE
+
+
+def load_existing_hashes(
+    table: str,
+    key: Tuple[str, ...],
+    local_id: str,
+    full_refresh: bool,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[tuple, str]:
+    """
+    `fetch_existing_hashes` tolerante a errores (sin hashes se re-ingesta todo),
+    completado con las filas que el checkpoint registra como ya escritas.
+    """
+    existing: Dict[tuple, str] = {}
+    if not full_refresh:
+        try:
+            existing = fetch_existing_hashes(table, key, local_id)
+        except Exception as e:
+            print(f"[WARN] No se pudieron leer hashes de {table} ({str(e)}); se re-ingesta todo")
+
+    if checkpoint is not None:
+        completed = checkpoint.completed(checkpoint_scope(table, local_id))
+        if completed:
+            print(f"[INFO] Retomando {table}: {len(completed)} filas ya escritas según {checkpoint.path}")
+            existing.update(completed)
+    return existing
+
+
+def checkpoint_scope(table: str, local_id: str) -> str:
+    """Ámbito de checkpoint de una tabla y un local."""
+    return f"{table}:{local_id}"
+
+
+def delete_where(table: str, local_id: str, column: str, values: List, **eq) -> int:
+    """
+    Elimina filas de un local cuyo `column` está en `values` (y que cumplen
+    los filtros de igualdad `eq`).
+
+    Returns:
+        Número de valores eliminados
+    """
+    deleted = 0
+    for start in range(0, len(values), UPSERT_BATCH_SIZE):
+        batch = values[start:start + UPSERT_BATCH_SIZE]
+        try:
+            query = get_supabase().table(table).delete().eq("local_id", local_id)
+            for name, value in eq.items():
+                query = query.eq(name, value)
+            query.in_(column, batch).execute()
+            deleted += len(batch)
+        except Exception as e:
+            print(f"  ✗ Error eliminando filas de {table}: {str(e)}")
+    return deleted
+
+
+def product_fields(product: Dict) -> List[Tuple[str, str]]:
+    """Campos etiquetados de un producto para chunking/embedding."""
+    return [
+        ("Categoría", product.get("categoria", "")),
+        ("Descripción", product.get("descripcion", "")),
+        ("Usos", ", ".join(product.get("usos", []))),
+        ("Beneficios", ", ".join(product.get("beneficios", []))),
+        ("Variantes", ", ".join(product.get("variantes", [])[:3])),
+    ]
+
+
+def product_rows(product: Dict, local_id: str) -> List[Dict]:
+    """Filas (una por chunk, sin embedding) de un producto del catálogo."""
+    chunks = chunk_fields(
+        product_fields(product),
+        max_tokens=CHUNK_MAX_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        header=f"Producto: {product['nombre']}",
+    )
+    rows = []
+    for chunk_idx, chunk in enumerate(chunks):
+        row = {
+            "local_id": local_id,
+            "product_id": product["id"],
+            "nombre": product["nombre"],
+            "categoria": product.get("categoria", ""),
+            "subcategoria": product.get("subcategoria", ""),
+            "descripcion": product.get("descripcion", ""),
+            "variantes": product.get("variantes", []),
+            "usos": product.get("usos", []),
+            "beneficios": product.get("beneficios", []),
+            "chunk_index": chunk_idx,
+            "chunk_text": chunk,
+            "pdf_link": product.get("pdf_link", ""),
+            "stock": product.get("stock", True),
+        }
+        row["content_hash"] = content_hash(row, **chunk_params(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS))
+        rows.append(row)
+    return rows
+
+
+def faq_row(faq: Dict, local_id: str) -> Dict:
+    """Fila (sin embedding) de una FAQ del archivo JSON."""
+    row = {
+        "local_id": local_id,
+        "faq_id": faq["id"],
+        "pregunta": faq["pregunta"],
+        "respuesta": faq["respuesta"],
+        "categoria": faq.get("categoria", ""),
+        "palabras_clave": faq.get("palabras_clave", []),
+        "productos_relacionados": faq.get("productos_relacionados", []),
+        "pdf_link": faq.get("pdf_link", ""),
+    }
+    row["content_hash"] = content_hash(row)
+    return row
+
+
+def load_json(path: str, key: str) -> List[Dict]:
+    """Lee la lista `key` de un archivo JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+
+def sync_rows(
+    table: str,
+    key: Tuple[str, ...],
+    rows: Iterator[Dict],
+    existing: Dict[tuple, str],
+    text_key: str,
+    id_column: str,
+    args: argparse.Namespace,
+    stats: IngestStats,
+) -> IngestStats:
+    """
+    Filtra las filas sin cambios y envía el resto al pipeline concurrente
+    (o solo las cuenta con --dry-run). Las filas escritas se registran en el
+    checkpoint y las fallidas en `stats.failures` (por `id_column`).
+    """
+    scope = checkpoint_scope(table, args.local_id)
+
+    def on_written(batch: List[Dict]) -> None:
+        if args.checkpoint:
+            args.checkpoint.record(
+                scope, [(tuple(row[column] for column in key), row["content_hash"]) for row in batch]
+            )
+
+    def on_failed(batch: List[Dict], error: Exception) -> None:
+        print(f"  ✗ Error en lote de {len(batch)} filas de {table}: {str(error)}")
+        for row in batch:
+            stats.record_failure(row[id_column], error)
+
+    def changed() -> Iterator[Dict]:
+        for row in rows:
+            if existing.get(tuple(row[column] for column in key)) == row["content_hash"]:
+                stats.add(skipped=1)
+                continue
+            yield {**row, "created_at": datetime.now().isoformat()}
+
+    if args.dry_run:
+        for row in changed():
+            stats.add(chunks=1, tokens=count_tokens(row[text_key]))
+        return stats.finish()
+
+    return run_pipeline(
+        changed(),
+        embed_fn=embed_texts,
+        write_fn=lambda batch: bulk_upsert(table, batch, on_conflict=",".join(key), batch_size=args.upsert_batch_size),
+        text_key=text_key,
+        embedding_key="embedding",
+        embed_batch_size=args.batch_size,
+        embed_max_tokens=EMBEDDING_BATCH_MAX_TOKENS,
+        write_batch_size=args.upsert_batch_size,
+        embed_workers=args.concurrency,
+        write_workers=args.write_concurrency,
+        stats=stats,
+        on_written=on_written,
+        on_failed=on_failed,
+    )
+
+
+def finish_step(table: str, args: argparse.Namespace, stats: IngestStats) -> IngestStats:
+    """Si el paso terminó completo y sin fallos, su checkpoint ya no hace falta."""
+    if stats.aborted:
+        print(f"✗ {table}: lectura interrumpida, se conserva el checkpoint (volver a ejecutar)")
+        return stats
+    if args.checkpoint and not args.dry_run and not stats.failures and not stats.rows_failed:
+        args.checkpoint.clear(checkpoint_scope(table, args.local_id))
+    return stats
+
+
+def ingest_products(args: argparse.Namespace) -> IngestStats:
+    """
+    Ingesta incremental de productos del catálogo.
+
+    Solo se generan embeddings y se suben los chunks cuyo hash cambió; los
+    chunks de productos eliminados (o sobrantes) se borran.
+    """
+    print(f"[INFO] Cargando catálogo desde {args.catalog}...")
+    products = load_json(args.catalog, "productos")
+    print(f"[INFO] {len(products)} productos (local {args.local_id})")
+
+    existing = load_existing_hashes("products", PRODUCT_KEY, args.local_id, args.full_refresh, args.checkpoint)
+    chunk_counts: Dict[str, int] = {}  # product_id → número de chunks actual
+    stats = IngestStats()
+
+    # Hubo entradas sin id legible: no se sabe qué productos siguen en el catálogo
+    unidentified: List[str] = []
+
+    def rows() -> Iterator[Dict]:
+        for idx, product in enumerate(products, 1):
+            try:
+                product_chunks = product_rows(product, args.local_id)
+            except Exception as e:
+                product_id = product.get("id") if isinstance(product, dict) else None
+                if product_id is None:
+                    product_id = f"#{idx}"
+                    unidentified.append(product_id)
+                stats.record_failure(product_id, e)
+                name = product.get("nombre", product_id) if isinstance(product, dict) else product_id
+                print(f"  ✗ Error procesando {name}: {str(e)}")
+                continue
+            chunk_counts[product["id"]] = len(product_chunks)
+            print(f"[{idx}/{len(products)}] {product['nombre']} ({len(product_chunks)} chunks)")
+            yield from product_chunks
+
+    sync_rows("products", PRODUCT_KEY, rows(), existing, "chunk_text", "product_id", args, stats)
+
+    # Si la lectura se cortó, los productos no leídos no están en `chunk_counts`
+    # pero siguen en el catálogo: no se borra nada
+    if stats.aborted:
+        return finish_step("products", args, stats)
+
+    # Chunks obsoletos: productos que ya no están o que ahora tienen menos chunks
+    # (no se tocan los productos que fallaron en este run)
+    stale: Dict[str, List[int]] = {}
+    for _, product_id, chunk_idx in existing:
+        if product_id not in stats.failures and chunk_idx >= chunk_counts.get(product_id, 0):
+            stale.setdefault(product_id, []).append(chunk_idx)
+
+    removed = sorted(product_id for product_id in stale if product_id not in chunk_counts)
+    if unidentified and removed:
+        print(f"[INFO] {len(removed)} productos ausentes no se eliminan: entradas sin id ({', '.join(unidentified)})")
+        stale = {product_id: idxs for product_id, idxs in stale.items() if product_id in chunk_counts}
+        removed = []
+    shrunk = {product_id: idxs for product_id, idxs in stale.items() if product_id in chunk_counts}
+    stale_chunks = sum(len(idxs) for idxs in stale.values())
+    if stale_chunks:
+        if args.dry_run:
+            print(f"[DRY-RUN] Se eliminarían {stale_chunks} chunks obsoletos")
+        else:
+            delete_where("products", args.local_id, "product_id", removed)
+            for product_id, idxs in shrunk.items():
+                delete_where("products", args.local_id, "chunk_index", sorted(idxs), product_id=product_id)
+            print(f"[INFO] {stale_chunks} chunks obsoletos eliminados")
+
+    return finish_step("products", args, stats)
+
+
+def ingest_faqs(args: argparse.Namespace) -> IngestStats:
+    """Ingesta incremental de las FAQs del archivo JSON (se embebe la pregunta)."""
+    print(f"[INFO] Cargando FAQs desde {args.faqs}...")
+    faqs = load_json(args.faqs, "faqs")
+    print(f"[INFO] {len(faqs)} FAQs (local {args.local_id})")
+
+    existing = load_existing_hashes("faqs", FAQ_KEY, args.local_id, args.full_refresh, args.checkpoint)
+    stats = IngestStats()
+    rows: List[Dict] = []
+    unidentified: List[str] = []  # FAQs inválidas sin id legible
+    for idx, faq in enumerate(faqs, 1):
+        try:
+            rows.append(faq_row(faq, args.local_id))
+        except Exception as e:
+            faq_id = faq.get("id") if isinstance(faq, dict) else None
+            if faq_id is None:
+                faq_id = f"#{idx}"
+                unidentified.append(faq_id)
+            stats.record_failure(faq_id, e)
+            print(f"  ✗ Error procesando FAQ {faq_id}: {str(e)}")
+
+    sync_rows("faqs", FAQ_KEY, iter(rows), existing, "pregunta", "faq_id", args, stats)
+    if stats.aborted:
+        return finish_step("faqs", args, stats)
+
+    # Las FAQs que fallaron siguen en el archivo: no son obsoletas
+    stale_ids = sorted(
+        {faq_id for _, faq_id in existing} - {row["faq_id"] for row in rows} - set(stats.failures)
+    )
+    if stale_ids and unidentified:
+        print(f"[INFO] {len(stale_ids)} FAQs ausentes no se eliminan: entradas sin id ({', '.join(unidentified)})")
+        stale_ids = []
+    if stale_ids:
+        if args.dry_run:
+            print(f"[DRY-RUN] Se eliminarían {len(stale_ids)} FAQs obsoletas")
+        else:
+            print(f"[INFO] {delete_where('faqs', args.local_id, 'faq_id', stale_ids)} FAQs obsoletas eliminadas")
+
+    return finish_step("faqs", args, stats)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Parser de la CLI (subcomandos products, faqs, all)."""
+    parser = argparse.ArgumentParser(
+        description="Ingesta incremental de productos y FAQs DOLMEN en Supabase."
+    )
+    parser.add_argument("command", choices=["products", "faqs", "all"], help="Qué ingestar")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="Ruta al JSON del catálogo")
+    parser.add_argument("--faqs", default=DEFAULT_FAQ_PATH, help="Ruta al JSON de FAQs")
+    parser.add_argument("--local-id", default=DEFAULT_LOCAL_ID, help="ID del local (multi-tenant)")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE,
+                        help="Máximo de textos por request de embeddings")
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE,
+                        help="Filas por request de upsert")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY,
+                        help="Requests concurrentes a OpenAI")
+    parser.add_argument("--write-concurrency", type=int, default=WRITE_CONCURRENCY,
+                        help="Requests concurrentes a Supabase")
+    parser.add_argument("--embedding-cache", default=EMBEDDING_CACHE_PATH,
+                        help="Archivo SQLite de la cache de embeddings")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="No usar la cache de embeddings en disco")
+    parser.add_argument("--checkpoint", dest="checkpoint_path", default=CHECKPOINT_PATH,
+                        help="Archivo de checkpoint para retomar un run interrumpido")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="No leer ni escribir checkpoint")
+    parser.add_argument("--failure-report", default=FAILURE_REPORT_PATH,
+                        help="Archivo JSON con los elementos a reintentar")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Ignorar hashes existentes y re-ingestar todo")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Solo mostrar qué cambiaría (sin embeddings ni escrituras)")
+    return parser
+
+
+def write_failure_report(path: str, local_id: str, results: List[Tuple[str, IngestStats]]) -> int:
+    """
+    Imprime y guarda en `path` los elementos que fallaron (para reintentarlos).
+    Sin fallos, elimina un reporte anterior.
+
+    Returns:
+        Número de elementos fallidos
+    """
+    failures = {label: dict(stats.failures) for label, stats in results if stats.failures or stats.aborted}
+    for label, stats in results:
+        if stats.aborted:
+            failures[label]["(lectura interrumpida)"] = stats.aborted
+    total = sum(len(items) for items in failures.values())
+    if not total:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+
+    print(f"\n✗ {total} elementos a reintentar (ver {path}):")
+    for label, items in failures.items():
+        for item, error in sorted(items.items()):
+            print(f"  - {label} {item}: {error}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"local_id": local_id, "generated_at": datetime.now().isoformat(), "failures": failures},
+            f, ensure_ascii=False, indent=2,
+        )
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punto de entrada de la CLI.
+
+    Returns:
+        Código de salida (1 si algún producto/FAQ o fila no se pudo ingestar)
+    """
+    args = build_parser().parse_args(argv)
+    cache = None if args.dry_run or args.no_embedding_cache else open_embedding_cache(args.embedding_cache)
+    args.checkpoint = None if args.no_checkpoint else Checkpoint(args.checkpoint_path)
+
+    print("=" * 60)
+    print(f"INGESTA DOLMEN EN SUPABASE ({args.command}{', dry-run' if args.dry_run else ''})")
+    print("=" * 60)
+
+    steps = []
+    if args.command in ("products", "all"):
+        steps.append(("Productos", ingest_products))
+    if args.command in ("faqs", "all"):
+        steps.append(("FAQs", ingest_faqs))
+
+    results = []
+    for label, step in steps:
+        try:
+            results.append((label, step(args)))
+        except FileNotFoundError as e:
+            print(f"✗ Archivo no encontrado: {e.filename}")
+            return 1
+
+    print("\n" + "=" * 60)
+    failed = 0
+    for label, stats in results:
+        if args.dry_run:
+            print(f"[DRY-RUN] {label}: {stats.chunks} filas a embeber (~{stats.tokens} tokens), "
+                  f"{stats.skipped} sin cambios")
+        else:
+            print(stats.report(label))
+        failed += stats.rows_failed + bool(stats.aborted)
+    if cache:
+        cache_stats = cache.stats()
+        print(f"[CACHE] Embeddings en disco ({cache_stats['path']}): {cache_stats['hits']} aciertos, "
+              f"{cache_stats['misses']} generados")
+        open_embedding_cache(None)
+
+    if not args.dry_run:
+        failed += write_failure_report(args.failure_report, args.local_id, results)
+    if failed:
+        print("\n✗ Proceso completado con fallos (se puede volver a ejecutar: retoma donde quedó)")
+        return 1
+    print("\n✓ ¡Proceso completado!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
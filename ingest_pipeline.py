@@ -0,0 +1,295 @@
+"""
+Pipeline concurrente de ingesta: lector/chunker → embedder por lotes → escritor masivo.
+
+Cada etapa corre en su propio hilo (o pool de hilos) y se comunica con la
+siguiente mediante colas acotadas, de modo que la lectura no se adelanta
+indefinidamente a OpenAI y las escrituras a Supabase se solapan con la
+generación de embeddings. Al terminar se imprime un reporte de throughput.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chunking import count_tokens
+
+
+# Reintentos de llamadas externas (contados por el hook `record_retry` de tenacity)
+_retries = 0
+_retries_lock = threading.Lock()
+
+
+def record_retry(retry_state=None) -> None:
+    """Hook `before_sleep` de tenacity: cuenta un reintento."""
+    global _retries
+    with _retries_lock:
+        _retries += 1
+
+
+def retry_count() -> int:
+    """Total de reintentos registrados en el proceso."""
+    return _retries
+
+
+@dataclass
+class IngestStats:
+    """Contadores de una ejecución del pipeline."""
+    chunks: int = 0
+    skipped: int = 0
+    tokens: int = 0
+    embeddings: int = 0
+    embed_requests: int = 0
+    rows_written: int = 0
+    rows_failed: int = 0
+    retries: int = 0
+    failures: Dict[str, str] = field(default_factory=dict)
+    # Error que cortó la lectura de filas (el run no procesó todo el origen)
+    aborted: Optional[str] = None
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _retries_at_start: int = field(default_factory=retry_count, repr=False)
+
+    def add(self, **counts: int) -> None:
+        """Incrementa contadores de forma thread-safe."""
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_failure(self, item: str, error: Exception) -> None:
+        """Registra un elemento (ej: product_id) que hay que reintentar."""
+        with self._lock:
+            self.failures[str(item)] = str(error)
+
+    def finish(self) -> "IngestStats":
+        """Marca el fin de la ejecución."""
+        self.finished_at = time.monotonic()
+        self.retries = retry_count() - self._retries_at_start
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return max(end - self.started_at, 1e-9)
+
+    def report(self, label: str = "Ingesta") -> str:
+        """Resumen legible de throughput."""
+        return (
+            f"[STATS] {label}: {self.chunks} chunks ({self.skipped} sin cambios), "
+            f"{self.embeddings} embeddings (~{self.tokens} tokens, "
+            f"{self.embed_requests} requests), {self.rows_written} filas escritas, "
+            f"{self.rows_failed} fallidas, {self.retries} reintentos en {self.elapsed:.1f}s "
+            f"→ {self.rows_written / self.elapsed:.1f} filas/s, "
+            f"{self.embeddings / self.elapsed:.1f} embeddings/s"
+            + (f" [ABORTADO: {self.aborted}]" if self.aborted else "")
+        )
+
+
+class Checkpoint:
+    """
+    Registro append-only (JSONL) de las filas ya escritas en cada tabla/local.
+
+    Si un run se interrumpe, el siguiente parte de lo que quedó registrado y
+    no vuelve a procesar esas filas. Cuando un paso termina sin fallos, su
+    registro se borra.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: Dict[str, Dict[tuple, str]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # última línea truncada por una interrupción
+                    self._done.setdefault(entry["scope"], {})[tuple(entry["key"])] = entry["hash"]
+
+    def completed(self, scope: str) -> Dict[tuple, str]:
+        """Filas registradas como escritas: {clave: content_hash}."""
+        with self._lock:
+            return dict(self._done.get(scope, {}))
+
+    def record(self, scope: str, entries: List[tuple]) -> None:
+        """Registra filas escritas como pares (clave, content_hash)."""
+        with self._lock:
+            done = self._done.setdefault(scope, {})
+            with open(self.path, "a", encoding="utf-8") as f:
+                for key, content_hash in entries:
+                    done[tuple(key)] = content_hash
+                    f.write(json.dumps({"scope": scope, "key": list(key), "hash": content_hash}) + "\n")
+
+    def clear(self, scope: str) -> None:
+        """Descarta el registro de un paso completado."""
+        with self._lock:
+            if self._done.pop(scope, None) is None:
+                return
+            if not self._done:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            with open(self.path, "w", encoding="utf-8") as f:
+                for other, done in self._done.items():
+                    for key, content_hash in done.items():
+                        f.write(json.dumps({"scope": other, "key": list(key), "hash": content_hash}) + "\n")
+
+
+def iter_batches(
+    rows: Iterable[Dict],
+    text_key: str,
+    batch_size: int,
+    max_tokens: int,
+) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Agrupa filas en lotes respetando el máximo de inputs y el presupuesto
+    de tokens por request de embeddings.
+
+    Yields:
+        (lote, tokens del lote) con los tokens contados como en el chunker
+    """
+    current: List[Dict] = []
+    current_tokens = 0
+    for row in rows:
+        tokens = count_tokens(row[text_key])
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_tokens):
+            yield current, current_tokens
+            current, current_tokens = [], 0
+        current.append(row)
+        current_tokens += tokens
+    if current:
+        yield current, current_tokens
+
+
+_DONE = object()
+
+
+def run_pipeline(
+    rows: Iterable[Dict],
+    embed_fn: Callable[[List[str]], List[List[float]]],
+    write_fn: Callable[[List[Dict]], int],
+    text_key: str,
+    embedding_key: str = "embedding",
+    embed_batch_size: int = 100,
+    embed_max_tokens: int = 200000,
+    write_batch_size: int = 500,
+    embed_workers: int = 4,
+    write_workers: int = 2,
+    queue_size: int = 8,
+    stats: Optional[IngestStats] = None,
+    on_written: Optional[Callable[[List[Dict]], None]] = None,
+    on_failed: Optional[Callable[[List[Dict], Exception], None]] = None,
+) -> IngestStats:
+    """
+    Ejecuta la ingesta por etapas con concurrencia acotada.
+
+    Args:
+        rows: Filas sin embedding (lector + chunker; se consumen de forma perezosa)
+        embed_fn: Genera embeddings para una lista de textos (un request)
+        write_fn: Escribe un lote de filas; retorna cuántas se escribieron
+        text_key: Campo de la fila con el texto a embeber
+        embedding_key: Campo donde se guarda el embedding
+        embed_batch_size: Máximo de textos por request de embeddings
+        embed_max_tokens: Presupuesto de tokens por request de embeddings
+        write_batch_size: Filas por request de escritura
+        embed_workers: Requests concurrentes a OpenAI
+        write_workers: Requests concurrentes a Supabase
+        queue_size: Capacidad de cada cola entre etapas
+        stats: Contadores a actualizar (se crean si no se pasan)
+        on_written: Callback con las filas escritas en cada lote
+        on_failed: Callback con las filas que fallaron y el error
+
+    Returns:
+        IngestStats con los contadores de la ejecución. Si leer `rows` lanza
+        una excepción, se descartan los lotes aún no embebidos y el error
+        queda en `stats.aborted` (el run no está completo)
+    """
+    stats = stats or IngestStats()
+    embed_workers = max(1, embed_workers)
+    write_workers = max(1, write_workers)
+    embed_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    write_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+    def fail(batch: List[Dict], error: Exception) -> None:
+        stats.add(rows_failed=len(batch))
+        if on_failed:
+            on_failed(batch, error)
+        else:
+            print(f"  ✗ Error en lote de {len(batch)} filas: {str(error)}")
+
+    def reader():
+        try:
+            for batch, tokens in iter_batches(rows, text_key, embed_batch_size, embed_max_tokens):
+                stats.add(chunks=len(batch), tokens=tokens)
+                embed_queue.put(batch)
+        except Exception as e:
+            stats.aborted = f"{type(e).__name__}: {e}"
+            print(f"  ✗ Lectura de filas interrumpida: {stats.aborted}")
+        finally:
+            for _ in range(embed_workers):
+                embed_queue.put(_DONE)
+
+    def embedder():
+        while True:
+            batch = embed_queue.get()
+            if batch is _DONE:
+                return
+            if stats.aborted:
+                continue  # run abortado: no se gastan más embeddings
+            try:
+                vectors = embed_fn([row[text_key] for row in batch])
+                stats.add(embeddings=len(vectors), embed_requests=1)
+                write_queue.put([{**row, embedding_key: vector} for row, vector in zip(batch, vectors)])
+            except Exception as e:
+                fail(batch, e)
+
+    def flush(pending: List[Dict]) -> None:
+        try:
+            written = write_fn(pending)
+            stats.add(rows_written=written)
+            if written < len(pending):
+                fail(pending[written:], RuntimeError(f"{len(pending) - written} filas sin escribir"))
+            elif on_written:
+                on_written(pending)
+        except Exception as e:
+            fail(pending, e)
+
+    def writer():
+        pending: List[Dict] = []
+        while True:
+            batch = write_queue.get()
+            if batch is _DONE:
+                break
+            pending.extend(batch)
+            while len(pending) >= write_batch_size:
+                flush(pending[:write_batch_size])
+                pending = pending[write_batch_size:]
+        if pending:
+            flush(pending)
+
+    reader_thread = threading.Thread(target=reader, name="ingest-reader", daemon=True)
+    embedders = [
+        threading.Thread(target=embedder, name=f"ingest-embed-{i}", daemon=True)
+        for i in range(embed_workers)
+    ]
+    writers = [
+        threading.Thread(target=writer, name=f"ingest-write-{i}", daemon=True)
+        for i in range(write_workers)
+    ]
+    for thread in [reader_thread, *embedders, *writers]:
+        thread.start()
+
+    reader_thread.join()
+    for thread in embedders:
+        thread.join()
+    for _ in writers:
+        write_queue.put(_DONE)
+    for thread in writers:
+        thread.join()
+
+    return stats.finish()
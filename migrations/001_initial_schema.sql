@@ -0,0 +1,80 @@
+-- Migración 001: tablas de FAQs y productos (multi-tenant por local_id)
+-- Ejecutar las migraciones en orden en: https://app.supabase.com → SQL Editor
+-- (o con psql -f). Todas son idempotentes: re-ejecutarlas no cambia nada.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Migraciones aplicadas
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(10) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW()
+);
+
+-- VECTOR(1536) = dimensiones de text-embedding-3-small (ver EMBEDDING_DIMENSIONS)
+CREATE TABLE IF NOT EXISTS faqs (
+    id BIGSERIAL PRIMARY KEY,
+    faq_id VARCHAR(50) NOT NULL,
+    local_id VARCHAR(50) NOT NULL DEFAULT 'LOCAL_001',
+    pregunta VARCHAR(500) NOT NULL,
+    respuesta TEXT NOT NULL,
+    categoria VARCHAR(100),
+    palabras_clave TEXT[],
+    productos_relacionados VARCHAR(50)[],
+    pdf_link VARCHAR(500),
+    embedding VECTOR(1536),
+    content_hash VARCHAR(64),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id BIGSERIAL PRIMARY KEY,
+    product_id VARCHAR(50) NOT NULL,
+    local_id VARCHAR(50) NOT NULL DEFAULT 'LOCAL_001',
+    nombre VARCHAR(255) NOT NULL,
+    categoria VARCHAR(100),
+    subcategoria VARCHAR(100),
+    descripcion TEXT,
+    variantes TEXT[],
+    usos TEXT[],
+    beneficios TEXT[],
+    chunk_index INTEGER,
+    chunk_text TEXT,
+    pdf_link VARCHAR(500),
+    stock BOOLEAN DEFAULT TRUE,
+    embedding VECTOR(1536),
+    content_hash VARCHAR(64),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Tablas creadas con versiones anteriores de setup_supabase.sql
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE faqs ADD COLUMN IF NOT EXISTS local_id VARCHAR(50) NOT NULL DEFAULT 'LOCAL_001';
+ALTER TABLE products ADD COLUMN IF NOT EXISTS local_id VARCHAR(50) NOT NULL DEFAULT 'LOCAL_001';
+ALTER TABLE products ADD COLUMN IF NOT EXISTS pdf_link VARCHAR(500);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS stock BOOLEAN DEFAULT TRUE;
+
+-- Claves únicas por local: upserts idempotentes de ingest.py
+-- (on_conflict=local_id,faq_id y on_conflict=local_id,product_id,chunk_index)
+ALTER TABLE faqs DROP CONSTRAINT IF EXISTS faqs_faq_id_key;
+DROP INDEX IF EXISTS idx_products_chunk;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_faqs_local_faq ON faqs (local_id, faq_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_local_chunk ON products (local_id, product_id, chunk_index);
+
+-- Lectura anónima (las RPC de búsqueda corren con los permisos del llamador)
+ALTER TABLE faqs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE products ENABLE ROW LEVEL SECURITY;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE tablename = 'faqs' AND policyname = 'Allow anonymous read') THEN
+        CREATE POLICY "Allow anonymous read" ON faqs FOR SELECT USING (true);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE tablename = 'products' AND policyname = 'Allow anonymous read') THEN
+        CREATE POLICY "Allow anonymous read" ON products FOR SELECT USING (true);
+    END IF;
+END;
+$$;
+
+INSERT INTO schema_migrations (version, name) VALUES ('001', 'initial_schema')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,43 @@
+-- Migración 002: índices vectoriales HNSW
+-- HNSW no necesita entrenarse con datos: a diferencia de ivfflat sin `lists`
+-- sirve aunque se cree con la tabla vacía.
+-- m / ef_construction: más altos = mejor recall, construcción más lenta y más memoria
+
+DROP INDEX IF EXISTS idx_faqs_embedding;
+DROP INDEX IF EXISTS idx_products_embedding;
+CREATE INDEX IF NOT EXISTS idx_faqs_embedding_hnsw ON faqs
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+-- Solo productos en stock: es el filtro de search_products
+CREATE INDEX IF NOT EXISTS idx_products_embedding_hnsw ON products
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+    WHERE stock;
+
+-- Índices parciales por local: con muchos locales, el índice global devuelve
+-- los vecinos de todos y el filtro por local_id se aplica después (pueden
+-- quedar menos de k resultados). Un índice por local evita ese post-filtrado:
+--   SELECT create_local_vector_indexes('LOCAL_001');          -- m=16, ef_construction=64
+--   SELECT create_local_vector_indexes('LOCAL_002', 24, 100);
+CREATE OR REPLACE FUNCTION create_local_vector_indexes(
+    p_local_id text,
+    p_m int DEFAULT 16,
+    p_ef_construction int DEFAULT 64
+)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    suffix text := left(md5(p_local_id), 12);
+BEGIN
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON faqs USING hnsw (embedding vector_cosine_ops) '
+        'WITH (m = %s, ef_construction = %s) WHERE local_id = %L',
+        'idx_faqs_hnsw_' || suffix, p_m, p_ef_construction, p_local_id
+    );
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON products USING hnsw (embedding vector_cosine_ops) '
+        'WITH (m = %s, ef_construction = %s) WHERE local_id = %L AND stock',
+        'idx_products_hnsw_' || suffix, p_m, p_ef_construction, p_local_id
+    );
+END;
+$$;
+
+INSERT INTO schema_migrations (version, name) VALUES ('002', 'hnsw_indexes')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,93 @@
+-- Migración 003: RPC de búsqueda vectorial usadas por rag_pipeline.py
+-- Devuelven solo las columnas que usa el pipeline, con sus nombres
+-- (FAQ: id/question/answer/category/pdf_link; productos: los campos del
+-- contexto del prompt y de ProductoRecomendado) más `similarity`.
+--
+-- Ordenan por distancia (ORDER BY embedding <=> q LIMIT k) para que el
+-- planner use el índice HNSW, y fijan hnsw.ef_search solo para la
+-- transacción (más alto = mejor recall, más lento). El local_id va como
+-- literal en SQL dinámico para que el planner pueda elegir el índice parcial
+-- del local; los umbrales de similitud se aplican después del LIMIT.
+
+-- Versiones anteriores (otras firmas quedarían como sobrecargas ambiguas para PostgREST)
+DROP FUNCTION IF EXISTS search_faqs(vector, text, float);
+DROP FUNCTION IF EXISTS search_faqs(vector, varchar, int);
+DROP FUNCTION IF EXISTS search_faqs(vector, text, float, int);
+DROP FUNCTION IF EXISTS search_products(vector, text, int);
+DROP FUNCTION IF EXISTS search_products(vector, varchar, int);
+DROP FUNCTION IF EXISTS search_products(vector, text, int, int);
+
+CREATE OR REPLACE FUNCTION search_faqs(
+    query_embedding vector(1536),
+    local_id text,
+    match_threshold float DEFAULT 0.75,
+    ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+    id text,
+    question text,
+    answer text,
+    category text,
+    pdf_link text,
+    similarity float
+) LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+    RETURN QUERY EXECUTE format(
+        'SELECT * FROM ('
+        '  SELECT f.faq_id::text, f.pregunta::text, f.respuesta, f.categoria::text, f.pdf_link::text,'
+        '         (1 - (f.embedding <=> $1))::float AS similarity'
+        '  FROM faqs f'
+        '  WHERE f.local_id = %L'
+        '  ORDER BY f.embedding <=> $1'
+        '  LIMIT 1'
+        ') best WHERE best.similarity > $2',
+        local_id
+    ) USING query_embedding, match_threshold;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION search_products(
+    query_embedding vector(1536),
+    local_id text,
+    match_count int DEFAULT 3,
+    match_threshold float DEFAULT 0.0,
+    ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+    id text,
+    product_id text,
+    nombre text,
+    categoria text,
+    descripcion text,
+    variantes text[],
+    usos text[],
+    beneficios text[],
+    pdf_link text,
+    similarity float
+) LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+    -- Cada producto tiene varios chunks: se piden de más y se conserva el
+    -- mejor chunk de cada producto
+    RETURN QUERY EXECUTE format(
+        'SELECT * FROM ('
+        '  SELECT DISTINCT ON (c.product_id) c.product_id::text, c.product_id::text, c.nombre::text,'
+        '         c.categoria::text, c.descripcion, c.variantes, c.usos, c.beneficios, c.pdf_link::text,'
+        '         c.similarity'
+        '  FROM ('
+        '    SELECT p.*, (1 - (p.embedding <=> $1))::float AS similarity'
+        '    FROM products p'
+        '    WHERE p.local_id = %L AND p.stock'
+        '    ORDER BY p.embedding <=> $1'
+        '    LIMIT $2 * 4'
+        '  ) c'
+        '  ORDER BY c.product_id, c.similarity DESC'
+        ') best WHERE best.similarity >= $3 ORDER BY best.similarity DESC LIMIT $2',
+        local_id
+    ) USING query_embedding, match_count, match_threshold;
+END;
+$$;
+
+INSERT INTO schema_migrations (version, name) VALUES ('003', 'search_functions')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,84 @@
+-- Migración 004: búsqueda híbrida (texto completo + vectorial) en una sola RPC
+-- Combina el ranking de tsvector (términos exactos: medidas, códigos) con el
+-- vectorial (semántica) por Reciprocal Rank Fusion:
+--   score = full_text_weight / (rrf_k + rank_texto) + semantic_weight / (rrf_k + rank_vector)
+
+-- Texto indexable de cada chunk: nombre (peso A), categoría (B) y chunk (C)
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(categoria, '') || ' ' || coalesce(subcategoria, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(chunk_text, '')), 'C')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING gin (search_vector);
+
+CREATE OR REPLACE FUNCTION search_hybrid(
+    query_text text,
+    query_embedding vector(1536),
+    local_id text,
+    match_count int DEFAULT 3,
+    match_threshold float DEFAULT 0.0,
+    full_text_weight float DEFAULT 1.0,
+    semantic_weight float DEFAULT 1.0,
+    rrf_k int DEFAULT 50,
+    ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+    id text,
+    product_id text,
+    nombre text,
+    categoria text,
+    descripcion text,
+    variantes text[],
+    usos text[],
+    beneficios text[],
+    pdf_link text,
+    similarity float,
+    text_rank float,
+    score float
+) LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+    -- Candidatos de cada ranking: chunks, $3 * 4 por lado; los que solo
+    -- llegan por vector deben superar match_threshold
+    RETURN QUERY EXECUTE format(
+        'WITH full_text AS ('
+        '  SELECT t.id, t.text_rank, row_number() OVER (ORDER BY t.text_rank DESC, t.id) AS rank_ix'
+        '  FROM ('
+        '    SELECT p.id, ts_rank_cd(p.search_vector, q)::float AS text_rank'
+        '    FROM products p, websearch_to_tsquery(''spanish'', $2) q'
+        '    WHERE p.local_id = %L AND p.stock AND p.search_vector @@ q'
+        '    ORDER BY text_rank DESC'
+        '    LIMIT $3 * 4'
+        '  ) t'
+        '), semantic AS ('
+        '  SELECT s.id, row_number() OVER (ORDER BY s.distance, s.id) AS rank_ix'
+        '  FROM ('
+        '    SELECT p.id, p.embedding <=> $1 AS distance'
+        '    FROM products p'
+        '    WHERE p.local_id = %L AND p.stock'
+        '    ORDER BY p.embedding <=> $1'
+        '    LIMIT $3 * 4'
+        '  ) s'
+        '), fused AS ('
+        '  SELECT coalesce(ft.id, sm.id) AS id, coalesce(ft.text_rank, 0.0) AS text_rank,'
+        '         coalesce($5 / ($7 + ft.rank_ix), 0.0) + coalesce($6 / ($7 + sm.rank_ix), 0.0) AS score,'
+        '         ft.id IS NOT NULL AS text_match'
+        '  FROM full_text ft FULL OUTER JOIN semantic sm ON ft.id = sm.id'
+        ')'
+        'SELECT * FROM ('
+        '  SELECT DISTINCT ON (p.product_id) p.product_id::text, p.product_id::text, p.nombre::text,'
+        '         p.categoria::text, p.descripcion, p.variantes, p.usos, p.beneficios, p.pdf_link::text,'
+        '         (1 - (p.embedding <=> $1))::float AS similarity, f.text_rank::float, f.score::float'
+        '  FROM fused f JOIN products p ON p.id = f.id'
+        '  WHERE f.text_match OR 1 - (p.embedding <=> $1) >= $4'
+        '  ORDER BY p.product_id, f.score DESC'
+        ') best ORDER BY best.score DESC LIMIT $3',
+        local_id, local_id
+    ) USING query_embedding, query_text, match_count, match_threshold,
+            full_text_weight, semantic_weight, rrf_k;
+END;
+$$;
+
+INSERT INTO schema_migrations (version, name) VALUES ('004', 'hybrid_search')
+ON CONFLICT (version) DO NOTHING;
@@ -3,14 +3,31 @@ Módulo RAG con soporte para referencias a PDF.
 Implementa pipeline híbrido: FAQ primero, luego búsqueda vectorial.
 """
 
-from typing import Dict, List, Optional
-from dataclasses import dataclass
-from supabase import create_client
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import asyncio
+import heapq
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Tuple, Union
+from dataclasses import dataclass, replace
+import numpy as np
+from supabase import acreate_client, create_client
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 import json
 
+from chunking import truncate_tokens
+from text_normalization import normalize_text, normalize_tokens
+from vector_index import LocalVectorStore
+
+# Tokens máximos de la descripción de cada producto en el contexto del prompt
+CONTEXT_DESCRIPTION_TOKENS = 300
+# Similitud mínima de la búsqueda vectorial de FAQs (match_threshold de search_faqs)
+FAQ_MATCH_THRESHOLD = 0.75
+
 
 @dataclass
 class RAGResponse:
@@ -20,17 +37,948 @@ class RAGResponse:
     producto_recomendado: Optional[Dict] = None
     pdf_link: Optional[str] = None
     confianza: float = 0.0
+    cached: bool = False  # True si se sirvió desde la cache de respuestas
+
+
+class TTLCache:
+    """
+    Cache LRU en memoria con expiración (TTL) y contadores de hits/misses.
+    Thread-safe; pensado para valores pequeños (embeddings, respuestas).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor si existe y no expiró; None en caso contrario."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Si hay un valor vigente para `key` (sin contar hit/miss ni reordenar)."""
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Guarda un valor, desalojando el menos usado si se supera `maxsize`."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def remove_if(self, predicate) -> int:
+        """
+        Elimina las entradas cuya clave cumple `predicate`.
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> int:
+        """
+        Vacía la cache (los contadores se conservan).
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            removed = len(self._data)
+            self._data.clear()
+            return removed
+
+    def stats(self) -> Dict[str, float]:
+        """Tamaño actual y contadores de la cache."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Cache semántica de respuestas RAG por local.
+
+    Guarda los embeddings (normalizados, float32) de preguntas ya respondidas
+    en una matriz NumPy por local y retorna la respuesta cacheada cuando la
+    similitud coseno con la nueva pregunta supera `threshold`. Cubre
+    paráfrasis que la cache exacta no detecta. Al llenarse, cada local
+    reemplaza sus entradas más antiguas (buffer circular).
+    """
+
+    def __init__(self, threshold: float = 0.95, capacity: int = 512, ttl: float = 3600.0):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._namespaces: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, local_id: str, dim: int, data_version: Hashable) -> Dict:
+        """Namespace del local; se reinicia si cambió la versión de datos o la dimensión."""
+        ns = self._namespaces.get(local_id)
+        if ns is None or ns["version"] != data_version or ns["matrix"].shape[1] != dim:
+            ns = {
+                "version": data_version,
+                "matrix": np.zeros((self.capacity, dim), dtype=np.float32),
+                "expires": np.zeros(self.capacity, dtype=np.float64),
+                "top_k": np.zeros(self.capacity, dtype=np.int32),
+                "responses": [None] * self.capacity,
+                "next": 0,
+            }
+            self._namespaces[local_id] = ns
+        return ns
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        local_id: str,
+        embedding: List[float],
+        data_version: Hashable,
+        top_k: int,
+    ) -> Optional["RAGResponse"]:
+        """
+        Busca una respuesta cacheada para una pregunta similar.
+
+        Args:
+            local_id: ID del local
+            embedding: Embedding de la pregunta
+            data_version: Versión de los datos (FAQs/catálogo) vigente
+            top_k: Productos usados como contexto (debe coincidir)
+
+        Returns:
+            RAGResponse cacheada, o None
+        """
+        if self.capacity <= 0:
+            return None
+        vector = self._normalize(embedding)
+        with self._lock:
+            ns = self._namespace(local_id, vector.shape[0], data_version)
+            valid = (ns["expires"] > time.monotonic()) & (ns["top_k"] == top_k)
+            if valid.any():
+                sims = ns["matrix"] @ vector
+                sims[~valid] = -1.0
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self.hits += 1
+                    return ns["responses"][best]
+            self.misses += 1
+            return None
+
+    def add(
+        self,
+        local_id: str,
+        embedding: List[float],
+        response: "RAGResponse",
+        data_version: Hashable,
+        top_k: int,
+    ) -> None:
+        """Guarda la respuesta de una pregunta, reemplazando la entrada más antigua si está lleno."""
+        if self.capacity <= 0:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            ns = self._namespace(local_id, vector.shape[0], data_version)
+            slot = ns["next"]
+            ns["matrix"][slot] = vector
+            ns["expires"][slot] = time.monotonic() + self.ttl
+            ns["top_k"][slot] = top_k
+            ns["responses"][slot] = response
+            ns["next"] = (slot + 1) % self.capacity
+
+    def invalidate(self, local_id: Optional[str] = None) -> int:
+        """
+        Descarta las entradas de un local (o de todos si local_id es None).
+
+        Returns:
+            Número de entradas vigentes descartadas
+        """
+        with self._lock:
+            if local_id is None:
+                targets = list(self._namespaces)
+            else:
+                targets = [local_id] if local_id in self._namespaces else []
+            now = time.monotonic()
+            removed = 0
+            for key in targets:
+                removed += int((self._namespaces.pop(key)["expires"] > now).sum())
+            return removed
+
+    def stats(self) -> Dict[str, float]:
+        """Tamaño actual y contadores de la cache."""
+        now = time.monotonic()
+        total = self.hits + self.misses
+        return {
+            "size": sum(int((ns["expires"] > now).sum()) for ns in self._namespaces.values()),
+            "capacity_per_local": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza una consulta para usarla como clave de cache."""
+    return " ".join(query.lower().split())
+
+
+class _JSONFileIndex(ABC):
+    """
+    Base de los índices en memoria construidos a partir de un archivo JSON.
+
+    El archivo se carga una sola vez y se pre-normaliza. Se recarga
+    explícitamente con `reload()` o automáticamente cuando cambia el
+    mtime del archivo (revisado como máximo cada `check_interval` segundos).
+
+    El scoring usa un índice invertido: cada palabra del vocabulario apunta
+    a {entry_idx: peso}, con el peso del mejor campo donde aparece. Las
+    subclases definen cómo se construyen las entradas en `_build`.
+    """
+
+    # Máximo de tokens de consulta cuyas postings se memorizan
+    TOKEN_CACHE_SIZE = 10000
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        # Snapshot inmutable (entries, exact, vocab, token_cache)
+        self._index: tuple = ([], {}, {}, {})
+        # Se incrementa en cada recarga exitosa (invalida caches dependientes)
+        self.version = 0
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @abstractmethod
+    def _build(self, data) -> tuple:
+        """Construye (entries, exact, vocab) a partir del JSON cargado."""
+
+    @staticmethod
+    def _add_field(vocab: Dict[str, Dict[int, int]], idx: int, text: str, weight: int):
+        """Agrega las palabras normalizadas de un campo al vocabulario."""
+        for word in normalize_tokens(text):
+            postings = vocab.setdefault(word, {})
+            if postings.get(idx, 0) < weight:
+                postings[idx] = weight
+
+    def reload(self) -> bool:
+        """
+        Relee el archivo y reconstruye el índice.
+
+        Returns:
+            True si se cargó correctamente; si falla se conserva el índice anterior
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                entries, exact, vocab = self._build(data)
+            except (OSError, ValueError, AttributeError, KeyError, TypeError):
+                # Archivo ausente, JSON inválido o entradas con forma inesperada
+                # (ej: "palabras_clave": null)
+                return False
+
+            # Reemplazo atómico: las consultas en curso siguen con el índice anterior
+            self._index = (entries, exact, vocab, {})
+            self.version += 1
+            self._mtime = mtime
+            return True
+
+    @property
+    def entries(self) -> List[Dict]:
+        """Entradas cargadas, en el formato de resultado."""
+        return self._index[0]
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Recarga el índice si el archivo cambió desde la última carga.
+
+        Returns:
+            True si hubo recarga
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+
+        if mtime != self._mtime:
+            return self.reload()
+        return False
+
+    def _postings(self, token: str, index: tuple) -> Dict[int, int]:
+        """
+        Retorna {entry_idx: peso} para un token de consulta.
+
+        Un token sin espacios es substring del texto sii es substring de
+        alguna de sus palabras, así que basta recorrer el vocabulario
+        (palabras únicas) en lugar de cada entrada. El resultado se memoriza.
+        """
+        _, exact, vocab, cache = index
+        postings = cache.get(token)
+        if postings is not None:
+            return postings
+
+        postings = {}
+        for word, word_postings in vocab.items():
+            if token in word:
+                for idx, weight in word_postings.items():
+                    if postings.get(idx, 0) < weight:
+                        postings[idx] = weight
+
+        # Una palabra clave exacta suma sobre el mejor campo: con plurales
+        # unificados varias entradas comparten la palabra clave y el texto desempata
+        for idx, weight in exact.get(token, {}).items():
+            postings[idx] = postings.get(idx, 0) + weight
+
+        if len(cache) >= self.TOKEN_CACHE_SIZE:
+            cache.clear()
+        cache[token] = postings
+        return postings
+
+    def _score(self, query: str, index: tuple) -> Dict[int, int]:
+        """Suma los pesos de cada token de la consulta por entrada candidata."""
+        # Misma normalización que al construir el índice (acentos, puntuación,
+        # stopwords, plurales); los tokens muy cortos matchean por accidente
+        tokens = [t for t in normalize_tokens(query) if len(t) > 2]
+
+        scores: Dict[int, int] = {}
+        for t in tokens:
+            for idx, weight in self._postings(t, index).items():
+                scores[idx] = scores.get(idx, 0) + weight
+        return scores
+
+
+class FAQIndex(_JSONFileIndex):
+    """
+    Índice en memoria de FAQs.
+
+    Pesos: match exacto en palabras_clave = 4 (se suma al del campo),
+    substring en pregunta = 2, substring en respuesta = 1. Texto y consultas
+    pasan por text_normalization.py. Solo se puntúan las FAQs candidatas.
+    """
+
+    KEYWORD_WEIGHT = 4
+    PREGUNTA_WEIGHT = 2
+    RESPUESTA_WEIGHT = 1
+
+    def __init__(self, path: str = "faq_poc.json", check_interval: float = 5.0):
+        super().__init__(path, check_interval)
+
+    def _build(self, data) -> tuple:
+        entries = []
+        keywords: Dict[str, Dict[int, int]] = {}
+        vocab: Dict[str, Dict[int, int]] = {}
+
+        for idx, faq in enumerate(data.get("faqs", [])):
+            entries.append({
+                "id": faq.get("id"),
+                "question": faq.get("pregunta"),
+                "answer": faq.get("respuesta"),
+                "category": faq.get("categoria"),
+                "pdf_link": faq.get("pdf_link"),
+            })
+
+            for pk in faq.get("palabras_clave", []):
+                keywords.setdefault(normalize_text(pk), {})[idx] = self.KEYWORD_WEIGHT
+
+            self._add_field(vocab, idx, faq.get("pregunta", ""), self.PREGUNTA_WEIGHT)
+            self._add_field(vocab, idx, faq.get("respuesta", ""), self.RESPUESTA_WEIGHT)
+
+        return entries, keywords, vocab
+
+    def search(self, query: str, min_score: int = 4) -> Optional[Dict]:
+        """
+        Busca la FAQ con mejor puntaje de palabras clave.
+
+        Args:
+            query: Pregunta del usuario
+            min_score: Puntaje mínimo para aceptar un match
+
+        Returns:
+            FAQ en el formato de `search_faqs`, o None
+        """
+        index = self._index
+        scores = self._score(query, index)
+        if not scores:
+            return None
+
+        # Mejor puntaje; en empate gana la FAQ que aparece primero en el archivo
+        best_idx, best_score = min(scores.items(), key=lambda item: (-item[1], item[0]))
+
+        # Requerir al menos `min_score` puntos (ej: 1 keyword match o 2 pregunta matches)
+        # Esto previene matches débiles/accidentales
+        if best_score >= min_score:
+            return dict(index[0][best_idx])
+        return None
+
+
+class CatalogIndex(_JSONFileIndex):
+    """
+    Índice en memoria del catálogo de productos.
+
+    Pesos: substring en nombre = 5, en categoría = 3, en descripción = 1.
+    Los payloads de resultado se precalculan al construir el índice.
+    """
+
+    NOMBRE_WEIGHT = 5
+    CATEGORIA_WEIGHT = 3
+    DESCRIPCION_WEIGHT = 1
+
+    def __init__(
+        self,
+        path: str = "catalogo_jerarquia.json",
+        check_interval: float = 5.0,
+        bm25_field_weights: Optional[Dict[str, float]] = None,
+    ):
+        # Índice BM25 de las mismas entradas, reconstruido en cada recarga
+        self.bm25_field_weights = bm25_field_weights
+        self.bm25 = BM25Index([], bm25_field_weights)
+        super().__init__(path, check_interval)
+
+    def _build(self, data) -> tuple:
+        if isinstance(data, dict):
+            products = data.get("productos") or data.get("products", [])
+        else:
+            products = data
+
+        entries = []
+        vocab: Dict[str, Dict[int, int]] = {}
+
+        for idx, p in enumerate(products):
+            entries.append({
+                "id": p.get("id"),
+                "product_id": p.get("product_id") or p.get("id"),
+                "nombre": p.get("nombre") or p.get("id"),
+                "categoria": p.get("categoria"),
+                "descripcion": p.get("descripcion", ""),
+                "variantes": p.get("variantes", []),
+                "usos": p.get("usos", []),
+                "beneficios": p.get("beneficios", []),
+                "pdf_link": p.get("pdf_link"),
+                "stock": p.get("stock", True),
+            })
+
+            self._add_field(vocab, idx, str(p.get("nombre", "")), self.NOMBRE_WEIGHT)
+            self._add_field(vocab, idx, str(p.get("categoria", "")), self.CATEGORIA_WEIGHT)
+            self._add_field(vocab, idx, str(p.get("descripcion", "")), self.DESCRIPCION_WEIGHT)
+
+        self.bm25 = BM25Index(entries, self.bm25_field_weights)
+        return entries, {}, vocab
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+        """
+        Busca productos por palabras clave.
+
+        Args:
+            query: Necesidad del usuario
+            top_k: Número de resultados a retornar
+
+        Returns:
+            Lista de productos ordenados por puntaje (vacía si no hay matches)
+        """
+        index = self._index
+        scores = self._score(query, index)
+        if not scores:
+            return []
+
+        # Selección top-k acotada (heap) en lugar de ordenar todos los matches;
+        # en empate se respeta el orden del catálogo
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [dict(index[0][idx]) for idx, _ in ranked]
+
+
+class BM25Index:
+    """
+    Índice léxico BM25F sobre los campos de texto del catálogo.
+
+    Cada campo aporta su frecuencia de término normalizada por largo
+    (respecto del promedio del campo) y multiplicada por su peso; la suma
+    pasa por la saturación de BM25 (`K1`) y se pondera por el IDF del
+    término. La contribución de cada (término, producto) se precalcula al
+    construir, así una consulta solo suma postings.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Pesos por campo (configurables con `field_weights`)
+    DEFAULT_FIELD_WEIGHTS = {
+        "nombre": 3.0,
+        "categoria": 1.5,
+        "descripcion": 1.0,
+        "variantes": 2.0,
+        "usos": 1.0,
+    }
+
+    def __init__(self, entries: List[Dict], field_weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            entries: Productos en el formato de resultado de `CatalogIndex`
+            field_weights: {campo: peso}; los campos ausentes no se indexan
+        """
+        self.entries = entries
+        self.field_weights = dict(self.DEFAULT_FIELD_WEIGHTS if field_weights is None else field_weights)
+
+        # término → {producto: {campo: frecuencia}} y largo de cada campo
+        frequencies: Dict[str, Dict[int, Dict[str, int]]] = {}
+        lengths: Dict[str, List[int]] = {field: [] for field in self.field_weights}
+        for idx, entry in enumerate(entries):
+            for field in self.field_weights:
+                tokens = self.tokenize(self._field_text(entry.get(field)))
+                lengths[field].append(len(tokens))
+                for token in tokens:
+                    counts = frequencies.setdefault(token, {}).setdefault(idx, {})
+                    counts[field] = counts.get(field, 0) + 1
+        averages = {
+            field: (sum(values) / len(values) if values else 0.0) or 1.0
+            for field, values in lengths.items()
+        }
+
+        total = len(entries)
+        self._postings: Dict[str, Dict[int, float]] = {}
+        for token, documents in frequencies.items():
+            idf = math.log(1 + (total - len(documents) + 0.5) / (len(documents) + 0.5))
+            postings = {}
+            for idx, counts in documents.items():
+                tf = sum(
+                    self.field_weights[field] * count
+                    / (1 - self.B + self.B * lengths[field][idx] / averages[field])
+                    for field, count in counts.items()
+                )
+                postings[idx] = idf * tf / (self.K1 + tf)
+            self._postings[token] = postings
+
+    @staticmethod
+    def tokenize(text: str) -> Tuple[str, ...]:
+        """Tokens normalizados (ver text_normalization.py), incluidas medidas como "07x30x41"."""
+        return normalize_tokens(text)
+
+    @staticmethod
+    def _field_text(value) -> str:
+        if isinstance(value, (list, tuple)):
+            return " ".join(str(item) for item in value)
+        return str(value or "")
+
+    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+        """
+        Productos con mayor puntaje BM25 para la consulta.
+
+        Returns:
+            Copias de las entradas con `bm25_score`, de mayor a menor
+        """
+        scores: Dict[int, float] = {}
+        for token in set(self.tokenize(query)):
+            for idx, score in self._postings.get(token, {}).items():
+                scores[idx] = scores.get(idx, 0.0) + score
+        # En empate se respeta el orden del catálogo
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [{**self.entries[idx], "bm25_score": score} for idx, score in ranked]
+
+
+def product_key(product: Dict) -> Optional[str]:
+    """Identificador de producto común a catálogo, RPC y snapshot local."""
+    return product.get("product_id") or product.get("id")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict]],
+    k: int = 60,
+    weights: Optional[List[float]] = None,
+) -> List[Dict]:
+    """
+    Fusiona rankings de productos con Reciprocal Rank Fusion:
+    puntaje = Σ peso / (k + posición). No depende de la escala de cada
+    ranking (BM25 y similitud coseno no son comparables).
+
+    Args:
+        rankings: Listas de productos, cada una de mejor a peor
+        k: Constante de RRF (más alta = menos peso a los primeros puestos)
+        weights: Peso de cada ranking (por defecto 1.0)
+
+    Returns:
+        Productos sin repetir con `rrf_score`, de mayor a menor; los campos de
+        un producto salen del primer ranking que lo trae, completados con los
+        de los siguientes (ej: `similarity`)
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for position, product in enumerate(ranking, start=1):
+            key = product_key(product)
+            if key is None:
+                continue
+            if key in fused:
+                for field, value in product.items():
+                    fused[key].setdefault(field, value)
+            else:
+                fused[key] = dict(product)
+            scores[key] = scores.get(key, 0.0) + weight / (k + position)
+    # Orden determinístico: mayor puntaje y, a igualdad, primera aparición
+    order = sorted(scores, key=lambda key: -scores[key])
+    return [{**fused[key], "rrf_score": scores[key]} for key in order]
+
+
+RESPONSE_PROMPT = ChatPromptTemplate.from_template("""
+Eres un vendedor experto en materiales de construcción DOLMEN.
+Responde la pregunta del cliente usando el contexto disponible.
+
+CONTEXTO DE PRODUCTOS:
+{context}
+
+PREGUNTA DEL CLIENTE:
+{query}
+
+INSTRUCCIONES:
+1. Responde de forma clara y concisa (máximo 3 oraciones)
+2. Recomenda productos específicos si es relevante
+3. Menciona variantes o especificaciones técnicas
+4. Sé amable y profesional
+
+RESPUESTA:
+""")
 
 
 class HybridRAGPipeline:
     """Pipeline RAG híbrido: FAQ + búsqueda vectorial."""
     
-    def __init__(self, supabase_url: str, supabase_key: str, openai_api_key: str):
+    # Chunks pedidos por producto buscado en el índice vectorial local
+    PRODUCT_CHUNK_OVERFETCH = 4
+    # Candidatos de cada ranking (BM25 y vectorial) en la recuperación híbrida
+    HYBRID_CANDIDATES = 10
+    
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        openai_api_key: str,
+        faq_path: str = "faq_poc.json",
+        catalog_path: str = "catalogo_jerarquia.json",
+        catalog_paths: Optional[Dict[str, str]] = None,
+        embedding_cache_size: int = 2048,
+        embedding_cache_ttl: float = 24 * 3600.0,
+        response_cache_size: int = 1024,
+        response_cache_ttl: float = 3600.0,
+        semantic_cache_threshold: float = 0.95,
+        semantic_cache_size: int = 512,
+        parallel_retrieval: bool = False,
+        faq_min_confidence: float = 0.85,
+        vector_snapshot_dir: Optional[str] = None,
+        local_vector_mode: str = "fallback",
+        vector_ivf_lists: int = 0,
+        vector_quantization: str = "none",
+        vector_first_pass_dims: Optional[int] = None,
+        embedding_dimensions: Optional[int] = None,
+        product_match_threshold: float = 0.0,
+        hybrid_search_rpc: bool = False,
+        hybrid_retrieval: bool = False,
+        bm25_field_weights: Optional[Dict[str, float]] = None,
+        rrf_k: int = 60,
+    ):
         self.supabase = create_client(supabase_url, supabase_key)
+        # Cliente asíncrono para `aquery`, creado al primer uso dentro del event loop
+        self._supabase_url = supabase_url
+        self._supabase_key = supabase_key
+        self._async_supabase = None
+        self._async_supabase_lock: Optional[asyncio.Lock] = None
         self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        # `embedding_dimensions` debe coincidir con el usado en la ingesta (ingest.py)
+        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=embedding_dimensions)
+        # Embeddings de consultas compartidos por la búsqueda de FAQs y productos
+        self.embedding_cache = TTLCache(embedding_cache_size, embedding_cache_ttl)
+        # Respuestas completas por (local_id, versión de datos, top_k, pregunta normalizada)
+        self.response_cache = TTLCache(response_cache_size, response_cache_ttl)
+        # Respuestas RAG de preguntas similares (paráfrasis), por local
+        self.semantic_cache = SemanticCache(
+            threshold=semantic_cache_threshold,
+            capacity=semantic_cache_size,
+            ttl=response_cache_ttl,
+        )
+        self.faq_index = FAQIndex(faq_path)
+        # Modo paralelo de `aquery`: FAQ y productos se recuperan a la vez
+        self.parallel_retrieval = parallel_retrieval
+        # Similitud con la que la FAQ de la RPC cancela la rama RAG: por encima
+        # de FAQ_MATCH_THRESHOLD (la RPC ya no devuelve FAQs por debajo)
+        if faq_min_confidence <= FAQ_MATCH_THRESHOLD:
+            raise ValueError(
+                f"faq_min_confidence ({faq_min_confidence}) debe ser mayor que "
+                f"FAQ_MATCH_THRESHOLD ({FAQ_MATCH_THRESHOLD})"
+            )
+        self.faq_min_confidence = faq_min_confidence
+        # Catálogo por local (multi-tenant); los locales sin entrada usan `catalog_path`
+        self.catalog_path = catalog_path
+        self.catalog_paths = catalog_paths or {}
+        self._catalog_indexes: Dict[str, CatalogIndex] = {}
+        self._catalog_lock = threading.Lock()
+        # Índice vectorial en proceso (snapshots de export_vectors.py):
+        # "prefer" lo usa antes que las RPC; "fallback" solo si la RPC falla
+        if local_vector_mode not in ("prefer", "fallback"):
+            raise ValueError(f"local_vector_mode inválido: {local_vector_mode}")
+        self.local_vector_mode = local_vector_mode
+        # Similitud mínima de productos (RPC y snapshot local) y RPC híbrida
+        # (texto completo + vectorial, migrations/004) en lugar de la vectorial
+        self.product_match_threshold = product_match_threshold
+        self.hybrid_search_rpc = hybrid_search_rpc
+        # Recuperación híbrida: BM25 del catálogo + búsqueda vectorial,
+        # fusionadas con RRF (en lugar de "palabras clave, si no vectorial")
+        self.hybrid_retrieval = hybrid_retrieval
+        self.bm25_field_weights = bm25_field_weights
+        self.rrf_k = rrf_k
+        # Con cuantización la primera pasada usa códigos float16/int8 y los
+        # candidatos se re-puntúan en float32 (ver vector_index.py)
+        self.vector_store = (
+            LocalVectorStore(
+                vector_snapshot_dir,
+                n_lists=vector_ivf_lists,
+                quantization=vector_quantization,
+                first_pass_dims=vector_first_pass_dims,
+            )
+            if vector_snapshot_dir else None
+        )
+
+    def _embed_query(self, query: str) -> List[float]:
+        """
+        Embedding de la consulta, usando la cache compartida.
+        La clave es (modelo, dimensiones, consulta normalizada).
+        """
+        key = (self.embeddings.model, self.embeddings.dimensions, normalize_query(query))
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self.embedding_cache.set(key, embedding)
+        return embedding
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        """Versión asíncrona de `_embed_query` (comparte la misma cache)."""
+        key = (self.embeddings.model, self.embeddings.dimensions, normalize_query(query))
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(query)
+            self.embedding_cache.set(key, embedding)
+        return embedding
+
+    async def _get_async_supabase(self):
+        """Retorna el cliente asíncrono de Supabase, creándolo la primera vez."""
+        if self._async_supabase is None:
+            if self._async_supabase_lock is None:
+                self._async_supabase_lock = asyncio.Lock()
+            async with self._async_supabase_lock:
+                if self._async_supabase is None:
+                    self._async_supabase = await acreate_client(self._supabase_url, self._supabase_key)
+        return self._async_supabase
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Estadísticas de las caches del pipeline."""
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "responses": self.response_cache.stats(),
+            "semantic": self.semantic_cache.stats(),
+        }
+
+    def invalidate_cache(self, local_id: Optional[str] = None) -> int:
+        """
+        Descarta respuestas cacheadas; llamar tras re-ingestar datos en Supabase.
+        Los cambios en los archivos locales de FAQs/catálogo se detectan solos
+        (la versión de los índices forma parte de la clave).
+
+        Args:
+            local_id: Local a invalidar; None invalida todos
+
+        Returns:
+            Número de respuestas descartadas
+        """
+        removed = self.semantic_cache.invalidate(local_id)
+        if local_id is None:
+            return removed + self.response_cache.clear()
+        return removed + self.response_cache.remove_if(lambda key: key[0] == local_id)
+
+    def _response_cache_key(self, pregunta: str, local_id: str, top_k: int) -> tuple:
+        """Clave de la cache de respuestas, ligada a la versión actual de los datos."""
+        self.faq_index.refresh_if_changed()
+        catalog_index = self._get_catalog_index(local_id)
+        catalog_index.refresh_if_changed()
+        return (
+            local_id,
+            self.faq_index.version,
+            catalog_index.version,
+            top_k,
+            normalize_query(pregunta),
+        )
+
+    def reload_faqs(self) -> bool:
+        """Fuerza la recarga del índice de FAQs (ej: tras re-ingestar)."""
+        return self.faq_index.reload()
+
+    def _get_catalog_index(self, local_id: str) -> CatalogIndex:
+        """
+        Retorna el índice de catálogo del local, construyéndolo la primera vez.
+        Locales que comparten archivo comparten índice.
+        """
+        path = self.catalog_paths.get(local_id, self.catalog_path)
+        index = self._catalog_indexes.get(path)
+        if index is None:
+            with self._catalog_lock:
+                index = self._catalog_indexes.get(path)
+                if index is None:
+                    index = CatalogIndex(path, bm25_field_weights=self.bm25_field_weights)
+                    self._catalog_indexes[path] = index
+        return index
+
+    def reload_catalogs(self) -> None:
+        """Fuerza la recarga de todos los índices de catálogo cargados."""
+        for index in list(self._catalog_indexes.values()):
+            index.reload()
     
-    def _search_faqs(self, query: str, local_id: str, threshold: float = 0.75) -> Optional[Dict]:
+    def _local_faq(self, query: str) -> Optional[Dict]:
+        """Búsqueda de FAQs en el índice en memoria (sin I/O)."""
+        try:
+            self.faq_index.refresh_if_changed()
+            return self.faq_index.search(query)
+        except Exception:
+            return None
+
+    def _local_products(self, query: str, local_id: str, top_k: int) -> List[Dict]:
+        """Búsqueda de productos en el índice de catálogo del local (sin I/O)."""
+        try:
+            catalog_index = self._get_catalog_index(local_id)
+            catalog_index.refresh_if_changed()
+            return catalog_index.search(query, top_k=top_k)
+        except Exception:
+            return []
+
+    def _catalog_products(self, query: str, local_id: str, top_k: int) -> List[Dict]:
+        """
+        Productos del catálogo en memoria que responden sin embedding. Con
+        `hybrid_retrieval` siempre se fusiona con la vectorial (vacío).
+        """
+        if self.hybrid_retrieval:
+            return []
+        return self._local_products(query, local_id, top_k)
+
+    def _bm25_products(self, query: str, local_id: str, limit: int) -> List[Dict]:
+        """Ranking BM25 del catálogo del local (sin I/O)."""
+        try:
+            catalog_index = self._get_catalog_index(local_id)
+            catalog_index.refresh_if_changed()
+            return catalog_index.bm25.search(query, top_k=limit)
+        except Exception:
+            return []
+
+    @property
+    def _product_threshold(self) -> Optional[float]:
+        """Umbral de productos para el snapshot local (None = sin umbral)."""
+        return self.product_match_threshold or None
+
+    def _product_rpc(
+        self,
+        query: str,
+        query_embedding: List[float],
+        local_id: str,
+        top_k: int,
+    ) -> tuple:
+        """Nombre y parámetros de la RPC de productos (vectorial o híbrida)."""
+        params = {
+            "query_embedding": query_embedding,
+            "local_id": local_id,
+            "match_count": top_k,
+            "match_threshold": self.product_match_threshold,
+        }
+        if self.hybrid_search_rpc:
+            return "search_hybrid", {**params, "query_text": query}
+        return "search_products", params
+
+    def _local_vector_search(
+        self,
+        table: str,
+        query_embedding: Optional[List[float]],
+        local_id: str,
+        limit: int,
+        threshold: Optional[float] = None,
+    ) -> Optional[List[Dict]]:
+        """
+        Búsqueda en el snapshot vectorial del local (ver vector_index.py).
+
+        Args:
+            table: "faqs" o "products"
+            query_embedding: Embedding de la consulta
+            local_id: ID del local
+            limit: Máximo de resultados (productos distintos en "products")
+            threshold: Similitud mínima
+
+        Returns:
+            Resultados con `similarity`, como las RPC; None si el local no
+            tiene snapshot o no es compatible con la consulta
+        """
+        if self.vector_store is None or query_embedding is None:
+            return None
+        snapshot = self.vector_store.get(local_id)
+        if snapshot is None:
+            return None
+
+        index = snapshot.faqs if table == "faqs" else snapshot.products
+        try:
+            # Cada producto puede tener varios chunks: se piden de más y se
+            # conserva el mejor chunk de cada producto
+            fetch = limit if table == "faqs" else limit * self.PRODUCT_CHUNK_OVERFETCH
+            hits = index.search(query_embedding, fetch, threshold)
+        except ValueError:
+            return None
+
+        results: List[Dict] = []
+        seen = set()
+        for row, score in hits:
+            payload = index.payloads[row]
+            # Como search_products: sin stock no se recomienda (snapshots
+            # exportados antes de filtrar por stock pueden incluirlos)
+            if payload["id"] in seen or not payload.get("stock", True):
+                continue
+            seen.add(payload["id"])
+            results.append({**payload, "similarity": score})
+            if len(results) >= limit:
+                break
+        return results
+
+    def _search_faqs(self, query: str, local_id: str, threshold: float = FAQ_MATCH_THRESHOLD) -> Optional[Dict]:
         """
         Busca en FAQs usando similitud de embeddings.
         Primero intenta búsqueda exacta por palabras clave, luego embeddings.
@@ -43,57 +991,81 @@ class HybridRAGPipeline:
         Returns:
             FAQ si se encuentra, None en caso contrario
         """
-        # 1. Intentar búsqueda LOCAL primero (más rápida y precisa)
+        # 1. Intentar búsqueda LOCAL primero (índice en memoria, sin I/O)
+        faq = self._local_faq(query)
+        if faq:
+            return faq
+        
+        # 2. Si no hay match local, búsqueda vectorial (snapshot local o Supabase)
         try:
-            with open("faq_poc.json", "r", encoding="utf-8") as f:
-                faqs = json.load(f).get("faqs", [])
-            
-            q = query.lower().strip()
-            tokens = [t for t in q.split() if len(t) > 2]
-            
-            # Búsqueda exacta: primero buscar en palabras_clave
-            best_match = None
-            best_score = 0
-            
-            for faq in faqs:
-                # Scoring: palabras_clave exactas > en pregunta > en respuesta
-                score = 0
-                palabras_clave = [pk.lower() for pk in faq.get("palabras_clave", [])]
-                pregunta = faq.get("pregunta", "").lower()
-                respuesta = faq.get("respuesta", "").lower()
-                
-                # Puntos por match en palabras_clave (más estricto)
-                keyword_matches = 0
-                for t in tokens:
-                    if t in palabras_clave:
-                        score += 4
-                        keyword_matches += 1
-                    elif t in pregunta:
-                        score += 2
-                    elif t in respuesta:
-                        score += 1
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = faq
-            
-            # Aumentar threshold: requerir al menos 4 puntos (ej: 1 keyword match o 2 pregunta matches)
-            # Esto previene matches débiles/accidentales
-            if best_match and best_score >= 4:
-                return {
-                    "id": best_match.get("id"),
-                    "question": best_match.get("pregunta"),
-                    "answer": best_match.get("respuesta"),
-                    "category": best_match.get("categoria"),
-                    "pdf_link": best_match.get("pdf_link"),
+            query_embedding = self._embed_query(query)
+        except Exception:
+            return None
+
+        if self.local_vector_mode == "prefer":
+            local = self._local_vector_search("faqs", query_embedding, local_id, 1, threshold)
+            if local is not None:
+                return local[0] if local else None
+
+        try:
+            response = self.supabase.rpc(
+                "search_faqs",
+                {
+                    "query_embedding": query_embedding,
+                    "local_id": local_id,
+                    "match_threshold": threshold,
                 }
+            ).execute()
+
+            if response.data and len(response.data) > 0:
+                return response.data[0]
+            return None
         except Exception:
             pass
+
+        # 3. Supabase no disponible: snapshot local
+        local = self._local_vector_search("faqs", query_embedding, local_id, 1, threshold)
+        return local[0] if local else None
+
+    async def _asearch_faqs(
+        self,
+        query: str,
+        local_id: str,
+        threshold: float = FAQ_MATCH_THRESHOLD,
+        check_local: bool = True,
+    ) -> Optional[Dict]:
+        """
+        Versión asíncrona de `_search_faqs`.
+        Con `check_local=False` se omite el índice en memoria (ya consultado).
+        """
+        faq = self._local_faq(query) if check_local else None
+        if faq:
+            return faq
         
-        # 2. Si no hay match local, intentar búsqueda en Supabase
         try:
-            query_embedding = self.embeddings.embed_query(query)
-            response = self.supabase.rpc(
+            query_embedding = await self._aembed_query(query)
+        except Exception:
+            return None
+        return await self._arpc_search_faqs(query_embedding, local_id, threshold)
+
+    async def _arpc_search_faqs(
+        self,
+        query_embedding: List[float],
+        local_id: str,
+        threshold: float = FAQ_MATCH_THRESHOLD,
+    ) -> Optional[Dict]:
+        """
+        Búsqueda vectorial de FAQs en Supabase (RPC asíncrona), o en el
+        snapshot local según `local_vector_mode`.
+        """
+        if self.local_vector_mode == "prefer":
+            local = self._local_vector_search("faqs", query_embedding, local_id, 1, threshold)
+            if local is not None:
+                return local[0] if local else None
+
+        try:
+            client = await self._get_async_supabase()
+            response = await client.rpc(
                 "search_faqs",
                 {
                     "query_embedding": query_embedding,
@@ -104,87 +1076,244 @@ class HybridRAGPipeline:
 
             if response.data and len(response.data) > 0:
                 return response.data[0]
+            return None
         except Exception:
             pass
 
-        return None
+        local = self._local_vector_search("faqs", query_embedding, local_id, 1, threshold)
+        return local[0] if local else None
     
-    def _search_products(self, query: str, local_id: str, top_k: int = 3) -> List[Dict]:
+    def _search_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int = 3,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
         """
         Busca productos relevantes usando similitud vectorial.
-        Primero intenta búsqueda local exacta, luego embeddings.
+        Primero intenta búsqueda local exacta, luego embeddings; con
+        `hybrid_retrieval`, fusiona BM25 y vectorial (ver `_hybrid_products`).
         
         Args:
             query: Necesidad del usuario
             local_id: ID del local
             top_k: Número de resultados a retornar
+            query_embedding: Embedding ya calculado de `query` (se reutiliza)
         
         Returns:
             Lista de productos relevantes
         """
-        # 1. Intentar búsqueda LOCAL primero (más rápida)
+        # 1. Intentar búsqueda LOCAL primero (índice en memoria, sin I/O)
+        matches = self._catalog_products(query, local_id, top_k)
+        if matches:
+            return matches
+        
+        # 2. Si no hay matches locales, búsqueda vectorial (snapshot local o Supabase)
+        return self._embedding_products(query, local_id, top_k, query_embedding)
+
+    def _embedding_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """Búsqueda que requiere embedding: híbrida o solo vectorial."""
+        if self.hybrid_retrieval:
+            return self._hybrid_products(query, local_id, top_k, query_embedding)
+        return self._vector_products(query, local_id, top_k, query_embedding)
+
+    def _vector_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """Búsqueda vectorial de productos: snapshot local o RPC de Supabase."""
         try:
-            with open("catalogo_jerarquia.json", "r", encoding="utf-8") as f:
-                catalog = json.load(f)
-                products = catalog.get("products", []) if isinstance(catalog, dict) else catalog
-            
-            q = query.lower().strip()
-            tokens = [t for t in q.split() if len(t) > 2]
-            matches = []
-            
-            for p in products:
-                # Scoring: nombre exacto > categoría > descripción
-                score = 0
-                nombre = str(p.get("nombre", "")).lower()
-                categoria = str(p.get("categoria", "")).lower()
-                descripcion = str(p.get("descripcion", "")).lower()
-                
-                for t in tokens:
-                    if t == nombre or t in nombre:
-                        score += 5
-                    elif t in categoria:
-                        score += 3
-                    elif t in descripcion:
-                        score += 1
-                
-                if score > 0:
-                    matches.append((score, {
-                        "id": p.get("id"),
-                        "product_id": p.get("product_id") or p.get("id"),
-                        "nombre": p.get("nombre") or p.get("id"),
-                        "categoria": p.get("categoria"),
-                        "descripcion": p.get("descripcion", ""),
-                        "variantes": p.get("variantes", []),
-                        "usos": p.get("usos", []),
-                        "beneficios": p.get("beneficios", []),
-                        "pdf_link": p.get("pdf_link"),
-                        "stock": p.get("stock", True),
-                    }))
-            
-            # Retornar matches ordenados por score
-            if matches:
-                matches.sort(key=lambda x: x[0], reverse=True)
-                return [m[1] for m in matches[:top_k]]
+            if query_embedding is None:
+                query_embedding = self._embed_query(query)
+        except Exception:
+            return []
+
+        if self.local_vector_mode == "prefer":
+            local = self._local_vector_search(
+                "products", query_embedding, local_id, top_k, self._product_threshold
+            )
+            if local is not None:
+                return local
+
+        try:
+            response = self.supabase.rpc(
+                *self._product_rpc(query, query_embedding, local_id, top_k)
+            ).execute()
+
+            return response.data if response.data else []
         except Exception:
             pass
         
-        # 2. Si no hay matches locales, intentar búsqueda en Supabase
+        # Supabase no disponible: snapshot local
+        return self._local_vector_search(
+            "products", query_embedding, local_id, top_k, self._product_threshold
+        ) or []
+
+    def _hybrid_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """
+        Recuperación híbrida: ranking BM25 (términos exactos, ej: medidas
+        "07x30x41") y ranking vectorial (semántica), fusionados con RRF.
+        Si la búsqueda vectorial falla queda el ranking BM25.
+        """
+        limit = max(top_k, self.HYBRID_CANDIDATES)
+        lexical = self._bm25_products(query, local_id, limit)
+        semantic = self._vector_products(query, local_id, limit, query_embedding)
+        return reciprocal_rank_fusion([lexical, semantic], k=self.rrf_k)[:top_k]
+
+    async def _asearch_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int = 3,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """
+        Versión asíncrona de `_search_products`.
+        Si se pasa `query_embedding` se reutiliza en lugar de recalcularlo.
+        """
+        matches = self._catalog_products(query, local_id, top_k)
+        if matches:
+            return matches
+        return await self._aembedding_products(query, local_id, top_k, query_embedding)
+
+    async def _aembedding_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """Versión asíncrona de `_embedding_products`."""
+        if self.hybrid_retrieval:
+            return await self._ahybrid_products(query, local_id, top_k, query_embedding)
+        return await self._avector_products(query, local_id, top_k, query_embedding)
+
+    async def _avector_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """Versión asíncrona de `_vector_products`."""
         try:
-            query_embedding = self.embeddings.embed_query(query)
-            response = self.supabase.rpc(
-                "search_products",
-                {
-                    "query_embedding": query_embedding,
-                    "local_id": local_id,
-                    "match_count": top_k,
-                }
+            if query_embedding is None:
+                query_embedding = await self._aembed_query(query)
+        except Exception:
+            return []
+
+        if self.local_vector_mode == "prefer":
+            local = self._local_vector_search(
+                "products", query_embedding, local_id, top_k, self._product_threshold
+            )
+            if local is not None:
+                return local
+
+        try:
+            client = await self._get_async_supabase()
+            response = await client.rpc(
+                *self._product_rpc(query, query_embedding, local_id, top_k)
             ).execute()
 
             return response.data if response.data else []
         except Exception:
             pass
         
-        return []
+        return self._local_vector_search(
+            "products", query_embedding, local_id, top_k, self._product_threshold
+        ) or []
+
+    async def _ahybrid_products(
+        self,
+        query: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """
+        Versión asíncrona de `_hybrid_products`: el ranking BM25 (en memoria)
+        se calcula mientras se espera el embedding y la RPC vectorial.
+        """
+        limit = max(top_k, self.HYBRID_CANDIDATES)
+        semantic_task = asyncio.create_task(
+            self._avector_products(query, local_id, limit, query_embedding)
+        )
+        try:
+            lexical = self._bm25_products(query, local_id, limit)
+            semantic = await semantic_task
+        finally:
+            if not semantic_task.done():
+                semantic_task.cancel()
+        return reciprocal_rank_fusion([lexical, semantic], k=self.rrf_k)[:top_k]
+    
+    @staticmethod
+    def _build_context(productos: List[Dict]) -> tuple:
+        """
+        Construye el contexto del prompt a partir de los productos.
+
+        Returns:
+            (contexto, lista de pdf_links)
+        """
+        context_parts = []
+        for prod in productos:
+            part = f"""
+Producto: {prod['nombre']}
+Descripción: {truncate_tokens(prod['descripcion'], CONTEXT_DESCRIPTION_TOKENS)}
+Usos: {', '.join(prod['usos'])}
+Variantes: {', '.join(prod['variantes'][:2])}
+Beneficios: {', '.join(prod['beneficios'])}
+"""
+            context_parts.append(part)
+        
+        context = "\n---\n".join(context_parts)
+        pdf_links = [p.get("pdf_link") for p in productos if p.get("pdf_link")]
+        return context, pdf_links
+
+    @staticmethod
+    def _faq_response(faq: Dict) -> RAGResponse:
+        """Respuesta a partir de una FAQ encontrada."""
+        return RAGResponse(
+            respuesta=faq["answer"],
+            fuente="faq",
+            pdf_link=faq.get("pdf_link"),
+            confianza=0.95,
+        )
+
+    @staticmethod
+    def _no_products_response() -> RAGResponse:
+        """Respuesta cuando no hay productos relevantes."""
+        return RAGResponse(
+            respuesta="No encontré productos relevantes. Por favor, contacta con nuestro equipo de soporte.",
+            fuente="rag",
+            confianza=0.0,
+        )
+
+    @staticmethod
+    def _rag_response(respuesta: str, productos: List[Dict], pdf_links: List[str]) -> RAGResponse:
+        """Respuesta generada por el LLM a partir de los productos recuperados."""
+        return RAGResponse(
+            respuesta=respuesta,
+            fuente="rag",
+            producto_recomendado=productos[0],
+            pdf_link=pdf_links[0] if pdf_links else None,
+            confianza=0.85,
+        )
     
     def _generate_response(
         self,
@@ -196,80 +1325,307 @@ class HybridRAGPipeline:
         """
         Genera respuesta usando LLM con contexto RAG.
         """
-        prompt = ChatPromptTemplate.from_template("""
-Eres un vendedor experto en materiales de construcción DOLMEN.
-Responde la pregunta del cliente usando el contexto disponible.
-
-CONTEXTO DE PRODUCTOS:
-{context}
-
-PREGUNTA DEL CLIENTE:
-{query}
-
-INSTRUCCIONES:
-1. Responde de forma clara y concisa (máximo 3 oraciones)
-2. Recomenda productos específicos si es relevante
-3. Menciona variantes o especificaciones técnicas
-4. Sé amable y profesional
-
-RESPUESTA:
-""")
-        
-        chain = prompt | self.llm
+        chain = RESPONSE_PROMPT | self.llm
         response = chain.invoke({
             "context": context,
             "query": query,
         })
         
         return response.content
+
+    async def _agenerate_response(
+        self,
+        query: str,
+        context: str,
+        productos: List[Dict],
+        pdf_links: List[str]
+    ) -> str:
+        """Versión asíncrona de `_generate_response`."""
+        chain = RESPONSE_PROMPT | self.llm
+        response = await chain.ainvoke({
+            "context": context,
+            "query": query,
+        })
+        
+        return response.content
     
-    def query(self, pregunta: str, local_id: str) -> RAGResponse:
+    async def _astream_generate_response(self, query: str, context: str) -> AsyncIterator[str]:
+        """Genera la respuesta del LLM token a token (`astream`)."""
+        chain = RESPONSE_PROMPT | self.llm
+        async for chunk in chain.astream({
+            "context": context,
+            "query": query,
+        }):
+            if chunk.content:
+                yield chunk.content
+
+    @staticmethod
+    def _meta_event(response: RAGResponse) -> Dict:
+        """Evento inicial del stream: fuente y referencias, sin el texto."""
+        return {
+            "type": "meta",
+            "fuente": response.fuente,
+            "producto_recomendado": response.producto_recomendado,
+            "pdf_link": response.pdf_link,
+            "confianza": response.confianza,
+            "cached": response.cached,
+        }
+
+    async def astream_query(self, pregunta: str, local_id: str, top_k: int = 3) -> AsyncIterator[Dict]:
+        """
+        Pipeline en modo streaming.
+
+        Emite primero un evento "meta" con el resultado de la recuperación
+        (fuente, producto_recomendado, pdf_link, confianza), luego eventos
+        "token" con el texto de la respuesta a medida que el LLM lo genera
+        y finalmente un evento "done". Las respuestas de FAQ y las
+        cacheadas se emiten como un único token.
+
+        Yields:
+            Diccionarios {"type": "meta" | "token" | "done", ...}
         """
-        Pipeline completo: FAQ → Búsqueda Vectorial → Generación
+        cache_key = self._response_cache_key(pregunta, local_id, top_k)
+        data_version = cache_key[1:3]
+        
+        # 1. Respuestas que no requieren LLM: cache exacta, FAQ, cache semántica
+        #    (esta última solo si el catálogo en memoria no responde)
+        response = self.response_cache.get(cache_key)
+        if response is not None:
+            response = replace(response, cached=True)
+        
+        query_embedding = None
+        productos: List[Dict] = []
+        if response is None:
+            faq = await self._asearch_faqs(pregunta, local_id)
+            if faq:
+                response = self._faq_response(faq)
+                self.response_cache.set(cache_key, response)
+        
+        if response is None:
+            productos = self._catalog_products(pregunta, local_id, top_k)
+        
+        if response is None and not productos:
+            try:
+                query_embedding = await self._aembed_query(pregunta)
+                similar = self.semantic_cache.lookup(local_id, query_embedding, data_version, top_k)
+                if similar is not None:
+                    response = replace(similar, cached=True)
+            except Exception:
+                pass
+        
+        if response is not None:
+            yield self._meta_event(response)
+            yield {"type": "token", "content": response.respuesta}
+            yield {"type": "done"}
+            return
+        
+        # 2. Recuperación de productos: se emite antes de generar
+        if not productos:
+            productos = await self._aembedding_products(pregunta, local_id, top_k, query_embedding)
+        if not productos:
+            response = self._no_products_response()
+            yield self._meta_event(response)
+            yield {"type": "token", "content": response.respuesta}
+            yield {"type": "done"}
+            return
+        
+        context, pdf_links = self._build_context(productos)
+        yield self._meta_event(self._rag_response("", productos, pdf_links))
+        
+        # 3. Generación token a token
+        parts = []
+        async for token in self._astream_generate_response(pregunta, context):
+            parts.append(token)
+            yield {"type": "token", "content": token}
+        
+        response = self._rag_response("".join(parts), productos, pdf_links)
+        self.response_cache.set(cache_key, response)
+        if query_embedding is not None:
+            self.semantic_cache.add(local_id, query_embedding, response, data_version, top_k)
+        yield {"type": "done"}
+
+    def query(self, pregunta: str, local_id: str, top_k: int = 3) -> RAGResponse:
+        """
+        Pipeline completo: Cache → FAQ → Búsqueda Vectorial → Generación
         
         Args:
             pregunta: Pregunta del usuario
             local_id: ID del local (multi-tenant)
+            top_k: Número de productos a usar como contexto
         
         Returns:
             RAGResponse con respuesta, fuente y referencias
+            (`cached=True` si se sirvió desde la cache)
+        """
+        cache_key = self._response_cache_key(pregunta, local_id, top_k)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return replace(cached, cached=True)
+        
+        response = self._query_uncached(pregunta, local_id, top_k, data_version=cache_key[1:3])
+        
+        # No cachear respuestas sin resultados (pueden deberse a fallas transitorias)
+        if response.confianza > 0:
+            self.response_cache.set(cache_key, response)
+        return response
+
+    async def aquery(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int = 3,
+        parallel: Optional[bool] = None,
+    ) -> RAGResponse:
+        """
+        Versión asíncrona de `query`: usa Supabase, embeddings y LLM
+        asíncronos para no bloquear el event loop del servidor.
+
+        Args:
+            parallel: Ejecutar FAQ y productos en paralelo
+                (por defecto, `self.parallel_retrieval`)
+        """
+        return await self._aquery(pregunta, local_id, top_k, parallel)
+
+    async def _aquery(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int,
+        parallel: Optional[bool] = None,
+        faq_checked: bool = False,
+    ) -> RAGResponse:
+        """`aquery`; con `faq_checked` no se repite la búsqueda de FAQ local."""
+        if parallel is None:
+            parallel = self.parallel_retrieval
+        
+        cache_key = self._response_cache_key(pregunta, local_id, top_k)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return replace(cached, cached=True)
+        
+        if parallel:
+            response = await self._aquery_parallel(
+                pregunta, local_id, top_k, data_version=cache_key[1:3], faq_checked=faq_checked
+            )
+        else:
+            response = await self._aquery_uncached(
+                pregunta, local_id, top_k, data_version=cache_key[1:3], faq_checked=faq_checked
+            )
+        
+        if response.confianza > 0:
+            self.response_cache.set(cache_key, response)
+        return response
+    
+    async def abatch_query(
+        self,
+        preguntas: List[str],
+        local_id: str,
+        top_k: int = 3,
+        max_concurrency: int = 8,
+    ) -> List[Union[RAGResponse, Exception]]:
+        """
+        Procesa varias preguntas del mismo local.
+
+        Las preguntas que necesitan embedding (sin respuesta cacheada ni FAQ
+        local) se embeben en una sola llamada batch a OpenAI, que precarga la
+        cache de embeddings; luego cada pregunta pasa por `aquery` con a lo
+        sumo `max_concurrency` en paralelo.
+
+        Returns:
+            Una entrada por pregunta, en el mismo orden: RAGResponse o la
+            excepción que produjo (un error no hace fallar el lote)
         """
+        # 1. Embeddings faltantes en una sola llamada (deduplicados). Las
+        #    caches se consultan sin contar hits/misses (eso lo hace `aquery`)
+        #    y la búsqueda de FAQ local no se repite en el paso 2
+        pending: Dict[tuple, str] = {}
+        local_faqs: Dict[str, Optional[Dict]] = {}
+        for pregunta in preguntas:
+            normalized = normalize_query(pregunta)
+            key = (self.embeddings.model, self.embeddings.dimensions, normalized)
+            if key in pending or normalized in local_faqs:
+                continue
+            if self._response_cache_key(pregunta, local_id, top_k) in self.response_cache:
+                continue
+            local_faqs[normalized] = self._local_faq(pregunta)
+            if local_faqs[normalized]:
+                continue
+            if key in self.embedding_cache:
+                continue
+            pending[key] = pregunta
+        
+        if pending:
+            try:
+                vectors = await self.embeddings.aembed_documents(list(pending.values()))
+                for key, vector in zip(pending, vectors):
+                    self.embedding_cache.set(key, vector)
+            except Exception:
+                # Sin batch: cada pregunta calculará su embedding individualmente
+                pass
+        
+        # 2. Recuperación y generación con concurrencia acotada;
+        #    las preguntas repetidas en el lote se procesan una sola vez
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(pregunta: str) -> RAGResponse:
+            normalized = normalize_query(pregunta)
+            faq = local_faqs.get(normalized)
+            if not faq:
+                async with semaphore:
+                    return await self._aquery(pregunta, local_id, top_k, faq_checked=normalized in local_faqs)
+            # FAQ local: mismos pasos que `aquery` con la FAQ ya encontrada
+            cache_key = self._response_cache_key(pregunta, local_id, top_k)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return replace(cached, cached=True)
+            response = self._faq_response(faq)
+            self.response_cache.set(cache_key, response)
+            return response
+        
+        unique: Dict[str, str] = {}
+        for pregunta in preguntas:
+            unique.setdefault(normalize_query(pregunta), pregunta)
+        results = await asyncio.gather(*(run(p) for p in unique.values()), return_exceptions=True)
+        by_question = dict(zip(unique, results))
+        return [by_question[normalize_query(p)] for p in preguntas]
+    
+    def _query_uncached(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int,
+        data_version: Hashable = None,
+    ) -> RAGResponse:
+        """Ejecuta el pipeline sin consultar la cache exacta de respuestas."""
         # 1. Buscar en FAQs (rápido y preciso)
         faq = self._search_faqs(pregunta, local_id)
         if faq:
-            return RAGResponse(
-                respuesta=faq["answer"],
-                fuente="faq",
-                pdf_link=faq.get("pdf_link"),
-                confianza=0.95,
-            )
+            return self._faq_response(faq)
         
-        # 2. Buscar productos relevantes
-        productos = self._search_products(pregunta, local_id, top_k=3)
+        # 2. Catálogo en memoria: si responde, no hace falta embedding
+        query_embedding = None
+        productos = self._catalog_products(pregunta, local_id, top_k)
         
         if not productos:
-            return RAGResponse(
-                respuesta="No encontré productos relevantes. Por favor, contacta con nuestro equipo de soporte.",
-                fuente="rag",
-                confianza=0.0,
-            )
+            # 3. Buscar una respuesta RAG ya generada para una pregunta similar
+            try:
+                query_embedding = self._embed_query(pregunta)
+                similar = self.semantic_cache.lookup(local_id, query_embedding, data_version, top_k)
+                if similar is not None:
+                    return replace(similar, cached=True)
+            except Exception:
+                pass
+            
+            # 4. Búsqueda vectorial (reutiliza el embedding)
+            productos = self._embedding_products(pregunta, local_id, top_k, query_embedding)
         
-        # 3. Construir contexto
-        context_parts = []
-        for prod in productos:
-            part = f"""
-Producto: {prod['nombre']}
-Descripción: {prod['descripcion']}
-Usos: {', '.join(prod['usos'])}
-Variantes: {', '.join(prod['variantes'][:2])}
-Beneficios: {', '.join(prod['beneficios'])}
-"""
-            context_parts.append(part)
+        if not productos:
+            return self._no_products_response()
         
-        context = "\n---\n".join(context_parts)
-        pdf_links = [p.get("pdf_link") for p in productos if p.get("pdf_link")]
+        # 5. Construir contexto
+        context, pdf_links = self._build_context(productos)
         
-        # 4. Generar respuesta con LLM
+        # 6. Generar respuesta con LLM
         respuesta = self._generate_response(
             pregunta,
             context,
@@ -277,82 +1633,143 @@ Beneficios: {', '.join(prod['beneficios'])}
             pdf_links,
         )
         
-        return RAGResponse(
-            respuesta=respuesta,
-            fuente="rag",
-            producto_recomendado=productos[0],
-            pdf_link=pdf_links[0] if pdf_links else None,
-            confianza=0.85,
+        response = self._rag_response(respuesta, productos, pdf_links)
+        if query_embedding is not None:
+            self.semantic_cache.add(local_id, query_embedding, response, data_version, top_k)
+        return response
+
+    async def _aquery_uncached(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int,
+        data_version: Hashable = None,
+        faq_checked: bool = False,
+    ) -> RAGResponse:
+        """Versión asíncrona de `_query_uncached` (etapas secuenciales)."""
+        faq = await self._asearch_faqs(pregunta, local_id, check_local=not faq_checked)
+        if faq:
+            return self._faq_response(faq)
+        
+        # Catálogo en memoria antes que la cache semántica (evita el embedding)
+        query_embedding = None
+        productos = self._catalog_products(pregunta, local_id, top_k)
+        if productos:
+            return await self._arag_from_products(pregunta, local_id, top_k, productos=productos)
+        
+        try:
+            query_embedding = await self._aembed_query(pregunta)
+            similar = self.semantic_cache.lookup(local_id, query_embedding, data_version, top_k)
+            if similar is not None:
+                return replace(similar, cached=True)
+        except Exception:
+            pass
+        
+        response = await self._arag_from_products(pregunta, local_id, top_k, query_embedding)
+        if query_embedding is not None and response.confianza > 0:
+            self.semantic_cache.add(local_id, query_embedding, response, data_version, top_k)
+        return response
+
+    async def _aquery_parallel(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int,
+        data_version: Hashable = None,
+        faq_checked: bool = False,
+    ) -> RAGResponse:
+        """
+        Variante de `_aquery_uncached` con FAQ y productos en paralelo.
+
+        Tras un miss de FAQ local se calcula un único embedding, y la RPC de
+        FAQs corre en paralelo con la búsqueda de productos + generación.
+        Si la FAQ llega con similitud >= `faq_min_confidence`, se cancela la
+        rama de productos/LLM; si no, se usa la respuesta RAG.
+        """
+        # 1. FAQ local (en memoria)
+        faq = None if faq_checked else self._local_faq(pregunta)
+        if faq:
+            return self._faq_response(faq)
+        
+        # 2. Embedding compartido y cache semántica
+        query_embedding = None
+        try:
+            query_embedding = await self._aembed_query(pregunta)
+            similar = self.semantic_cache.lookup(local_id, query_embedding, data_version, top_k)
+            if similar is not None:
+                return replace(similar, cached=True)
+        except Exception:
+            pass
+        
+        # 3. RPC de FAQs en paralelo con productos + LLM
+        rag_task = asyncio.create_task(
+            self._arag_from_products(pregunta, local_id, top_k, query_embedding)
         )
+        try:
+            if query_embedding is not None:
+                faq = await self._arpc_search_faqs(query_embedding, local_id)
+            if faq and faq.get("similarity", 1.0) >= self.faq_min_confidence:
+                return self._faq_response(faq)
+            response = await rag_task
+        finally:
+            if not rag_task.done():
+                rag_task.cancel()
+            elif not rag_task.cancelled():
+                # Si respondió la FAQ, un error de la rama RAG se descarta
+                # (recuperarlo evita "Task exception was never retrieved")
+                rag_task.exception()
+        
+        if query_embedding is not None and response.confianza > 0:
+            self.semantic_cache.add(local_id, query_embedding, response, data_version, top_k)
+        return response
 
+    async def _arag_from_products(
+        self,
+        pregunta: str,
+        local_id: str,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None,
+        productos: Optional[List[Dict]] = None,
+    ) -> RAGResponse:
+        """
+        Rama RAG asíncrona: búsqueda de productos → contexto → LLM.
+        Si se pasan `productos` (ya recuperados) se omite la búsqueda.
+        """
+        if productos is None:
+            productos = await self._asearch_products(pregunta, local_id, top_k, query_embedding)
+        
+        if not productos:
+            return self._no_products_response()
+        
+        context, pdf_links = self._build_context(productos)
+        respuesta = await self._agenerate_response(
+            pregunta,
+            context,
+            productos,
+            pdf_links,
+        )
+        
+        return self._rag_response(respuesta, productos, pdf_links)
 
-# SQL Functions para Supabase (ejecutar en SQL Editor)
-SUPABASE_SQL = """
--- Crear función de búsqueda en FAQs
-CREATE OR REPLACE FUNCTION search_faqs(
-    query_embedding vector,
-    local_id text,
-    match_threshold float DEFAULT 0.75
-)
-RETURNS TABLE (
-    id text,
-    question text,
-    answer text,
-    category text,
-    pdf_link text,
-    similarity float
-) LANGUAGE sql STABLE AS $$
-    SELECT
-        faqs.id,
-        faqs.question,
-        faqs.answer,
-        faqs.category,
-        faqs.pdf_link,
-        1 - (faqs.vector <=> query_embedding) AS similarity
-    FROM faqs
-    WHERE faqs.local_id = local_id
-    AND 1 - (faqs.vector <=> query_embedding) > match_threshold
-    ORDER BY similarity DESC
-    LIMIT 1;
-$$;
-
--- Crear función de búsqueda en Productos
-CREATE OR REPLACE FUNCTION search_products(
-    query_embedding vector,
-    local_id text,
-    match_count int DEFAULT 3
-)
-RETURNS TABLE (
-    id text,
-    product_id text,
-    nombre text,
-    categoria text,
-    descripcion text,
-    variantes text[],
-    usos text[],
-    beneficios text[],
-    pdf_link text,
-    stock boolean,
-    similarity float
-) LANGUAGE sql STABLE AS $$
-    SELECT
-        products.id,
-        products.product_id,
-        products.nombre,
-        products.categoria,
-        products.descripcion,
-        products.variantes,
-        products.usos,
-        products.beneficios,
-        products.pdf_link,
-        products.stock,
-        1 - (products.vector <=> query_embedding) AS similarity
-    FROM products
-    WHERE products.local_id = local_id
-    AND products.stock = true
-    ORDER BY similarity DESC
-    LIMIT match_count;
-$$;
-"""
+
+# SQL Functions para Supabase (ejecutar en SQL Editor): migraciones con las RPC
+# que usa el pipeline (search_faqs, search_products, search_hybrid)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+SEARCH_MIGRATIONS = ("003_search_functions.sql", "004_hybrid_search.sql")
+
+
+def load_supabase_sql(directory: str = MIGRATIONS_DIR) -> str:
+    """SQL de las funciones de búsqueda (vacío si no están las migraciones)."""
+    parts = []
+    for name in SEARCH_MIGRATIONS:
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                parts.append(f.read())
+        except OSError:
+            continue
+    return "\n".join(parts)
+
+
+SUPABASE_SQL = load_supabase_sql()
 
 print("Módulo RAG cargado correctamente")
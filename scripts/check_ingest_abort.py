@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Chequeo de ingesta interrumpida - DOLMEN RAG MVP
+Ejecutar: python scripts/check_ingest_abort.py
+
+Corre ingest.py contra un Supabase en memoria y embeddings falsos (no usa
+red ni API keys) y valida que un catálogo o archivo de FAQs con entradas
+corruptas, o cuya lectura se corta a mitad de camino:
+1. No elimina productos/FAQs que siguen en el archivo
+2. Conserva el checkpoint para retomar
+3. Registra el fallo en el reporte y termina con código de salida 1
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import ingest  # noqa: E402
+
+# ANSI colors
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+
+def check_mark(passed):
+    return f"{GREEN}✅{RESET}" if passed else f"{RED}❌{RESET}"
+
+
+def print_section(title):
+    print(f"\n{BLUE}{'='*50}{RESET}")
+    print(f"{BLUE}{title}{RESET}")
+    print(f"{BLUE}{'='*50}{RESET}")
+
+
+class MemoryTable:
+    """Subconjunto del query builder de supabase-py que usa ingest.py."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.op = None
+
+    def select(self, columns):
+        self.op = ("select", columns.split(","))
+        return self
+
+    def upsert(self, rows, on_conflict):
+        self.op = ("upsert", rows, on_conflict.split(","))
+        return self
+
+    def delete(self):
+        self.op = ("delete",)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def execute(self):
+        matched = [key for key, row in self.rows.items() if all(f(row) for f in self.filters)]
+        if self.op[0] == "select":
+            start, end = self.window
+            data = [{c: self.rows[key].get(c) for c in self.op[1]} for key in matched[start:end]]
+            return SimpleNamespace(data=data)
+        if self.op[0] == "upsert":
+            for row in self.op[1]:
+                self.rows[tuple(row[c] for c in self.op[2])] = dict(row)
+        else:
+            for key in matched:
+                del self.rows[key]
+        return SimpleNamespace(data=[])
+
+
+class MemorySupabase:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return MemoryTable(self.tables.setdefault(name, {}))
+
+
+class BrokenCatalog(list):
+    """Catálogo cuya lectura falla después de `ok` productos."""
+
+    def __init__(self, products, ok):
+        super().__init__(products)
+        self.ok = ok
+
+    def __iter__(self):
+        for idx, product in enumerate(list.__iter__(self)):
+            if idx == self.ok:
+                raise IOError("catálogo truncado")
+            yield product
+
+
+def product(product_id, nombre):
+    return {"id": product_id, "nombre": nombre, "descripcion": f"Descripción de {nombre}",
+            "precio": 1000, "stock": True}
+
+
+def faq(faq_id, pregunta):
+    return {"id": faq_id, "pregunta": pregunta, "respuesta": f"Respuesta a {pregunta}"}
+
+
+def run(workdir, items, command="products"):
+    """Ejecuta `ingest.py <command>` con los elementos dados; devuelve (código, salida)."""
+    ingest.load_json = lambda path, key: items
+    argv = [
+        command,
+        "--no-embedding-cache",
+        "--checkpoint", str(workdir / "checkpoint.jsonl"),
+        "--failure-report", str(workdir / "failures.json"),
+    ]
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        code = ingest.main(argv)
+    return code, out.getvalue()
+
+
+def stored_products(supabase):
+    return sorted({row["product_id"] for row in supabase.tables.get("products", {}).values()})
+
+
+def stored_faqs(supabase):
+    return sorted(row["faq_id"] for row in supabase.tables.get("faqs", {}).values())
+
+
+def check(passed, description, output=""):
+    print(f"{check_mark(passed)} {description}")
+    if not passed and output:
+        print(output)
+    return passed
+
+
+def main():
+    supabase = MemorySupabase()
+    ingest._supabase = supabase
+    ingest.embed_batch = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+    all_ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        p1, p2, p3 = product("P1", "Cemento"), product("P2", "Arena"), product("P3", "Varilla")
+
+        print_section("1. INGESTA INICIAL")
+        code, output = run(workdir, [p1, p2, p3])
+        all_ok &= check(code == 0, "Exit code 0", output)
+        all_ok &= check(stored_products(supabase) == ["P1", "P2", "P3"], "P1, P2, P3 en Supabase", output)
+
+        print_section("2. ENTRADA CORRUPTA EN EL CATÁLOGO")
+        # P1 cambia: se re-escribe y queda registrado en el checkpoint
+        p1 = dict(p1, descripcion="Cemento gris de uso general")
+        code, output = run(workdir, [p1, "corrupt-entry", p2])
+        all_ok &= check(code == 1, "Exit code 1", output)
+        all_ok &= check(stored_products(supabase) == ["P1", "P2", "P3"],
+                        "No se elimina nada (no se sabe qué producto era la entrada corrupta)", output)
+        all_ok &= check((workdir / "checkpoint.jsonl").exists(), "Checkpoint conservado", output)
+        all_ok &= check("#2" in (workdir / "failures.json").read_text(encoding="utf-8"),
+                        "Entrada corrupta en el reporte de fallos", output)
+
+        print_section("3. LECTURA INTERRUMPIDA")
+        p1 = dict(p1, descripcion="Cemento gris tipo I")
+        code, output = run(workdir, BrokenCatalog([p1, p2, p3], ok=1))
+        all_ok &= check(code == 1, "Exit code 1", output)
+        all_ok &= check(stored_products(supabase) == ["P1", "P2", "P3"],
+                        "No se eliminan los productos no leídos (P2, P3)", output)
+        all_ok &= check((workdir / "checkpoint.jsonl").exists(), "Checkpoint conservado", output)
+        all_ok &= check("catálogo truncado" in (workdir / "failures.json").read_text(encoding="utf-8"),
+                        "Error de lectura en el reporte de fallos", output)
+
+        print_section("4. RUN COMPLETO POSTERIOR")
+        code, output = run(workdir, [p1, p2])
+        all_ok &= check(code == 0, "Exit code 0", output)
+        all_ok &= check(stored_products(supabase) == ["P1", "P2"], "P3 (ya no está en el catálogo) eliminado", output)
+        all_ok &= check(not (workdir / "checkpoint.jsonl").exists(), "Checkpoint limpiado", output)
+
+        print_section("5. FAQ INVÁLIDA")
+        f1, f2, f3 = faq("F1", "¿Horario?"), faq("F2", "¿Envíos?"), faq("F3", "¿Garantía?")
+        code, output = run(workdir, [f1, f2], command="faqs")
+        all_ok &= check(code == 0 and stored_faqs(supabase) == ["F1", "F2"], "F1, F2 en Supabase", output)
+        broken = {"id": "F2", "respuesta": "sin pregunta"}
+        code, output = run(workdir, [f1, broken, {"pregunta": "¿Sin id?"}, f3], command="faqs")
+        all_ok &= check(code == 1, "Exit code 1", output)
+        all_ok &= check(stored_faqs(supabase) == ["F1", "F2", "F3"],
+                        "El resto de las FAQs se ingesta y F2 no se elimina", output)
+        report = (workdir / "failures.json").read_text(encoding="utf-8")
+        all_ok &= check('"F2"' in report and '"#3"' in report, "FAQs inválidas en el reporte de fallos", output)
+
+    print(f"\n{check_mark(all_ok)} {'Todos los chequeos pasaron' if all_ok else 'Hay chequeos fallidos'}")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
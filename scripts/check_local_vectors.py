@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Chequeo del snapshot vectorial local - DOLMEN RAG MVP
+Ejecutar: python scripts/check_local_vectors.py
+
+Sin red ni API keys: arma snapshots con embeddings sintéticos y valida que
+la búsqueda local (LOCAL_VECTOR_MODE=prefer) se comporta como la RPC
+search_products:
+1. export_vectors.py no exporta productos sin stock
+2. Un producto sin stock en el snapshot no se recomienda (none, float16, int8)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+os.environ.setdefault("OPENAI_API_KEY", "sk-check")
+
+import export_vectors  # noqa: E402
+import rag_pipeline  # noqa: E402
+from vector_index import QUANTIZATIONS, save_snapshot  # noqa: E402
+
+# ANSI colors
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+DIMS = 32
+LOCAL_ID = "LOCAL_001"
+
+
+def check_mark(passed):
+    return f"{GREEN}✅{RESET}" if passed else f"{RED}❌{RESET}"
+
+
+def print_section(title):
+    print(f"\n{BLUE}{'='*50}{RESET}")
+    print(f"{BLUE}{title}{RESET}")
+    print(f"{BLUE}{'='*50}{RESET}")
+
+
+def check(passed, description, detail=""):
+    print(f"{check_mark(passed)} {description}")
+    if not passed and detail:
+        print(f"   {detail}")
+    return passed
+
+
+def product_rows(embeddings):
+    """Filas de `products`: AGOTADO es el más parecido a la consulta y no tiene stock."""
+    names = ["AGOTADO", "P1", "P2", "P3"]
+    return [
+        {
+            "product_id": name,
+            "chunk_index": 0,
+            "nombre": name,
+            "categoria": "Test",
+            "descripcion": f"Producto {name}",
+            "pdf_link": None,
+            "stock": name != "AGOTADO",
+            "embedding": embedding.tolist(),
+        }
+        for name, embedding in zip(names, embeddings)
+    ]
+
+
+class MemorySupabase:
+    """`table().select().eq().order().range().execute()` sobre filas fijas."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        rows = self.tables.get(name, [])
+        query = SimpleNamespace()
+        query.select = query.eq = query.order = lambda *args, **kwargs: query
+        query.range = lambda start, end: SimpleNamespace(
+            execute=lambda: SimpleNamespace(data=rows[start:end + 1])
+        )
+        return query
+
+
+def local_search(snapshot_dir, quantization, query):
+    """Productos devueltos por el snapshot local (modo prefer, sin Supabase)."""
+    pipeline = rag_pipeline.HybridRAGPipeline(
+        "https://check.supabase.co",
+        "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.check",
+        "sk-check",
+        vector_snapshot_dir=snapshot_dir,
+        local_vector_mode="prefer",
+        vector_quantization=quantization,
+    )
+    return pipeline._local_vector_search("products", query.tolist(), LOCAL_ID, 3) or []
+
+
+def main():
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(4, DIMS)).astype(np.float32)
+    query = embeddings[0] + 0.01 * rng.normal(size=DIMS).astype(np.float32)
+    rows = product_rows(embeddings)
+    all_ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print_section("1. EXPORT DE SNAPSHOTS")
+        export_vectors.get_supabase = lambda: MemorySupabase({"faqs": [], "products": rows})
+        export_dir = os.path.join(tmp, "export")
+        faqs, chunks = export_vectors.export_local(LOCAL_ID, export_dir)
+        all_ok &= check(chunks == 3, "Productos sin stock no se exportan", f"{chunks} chunks exportados")
+
+        print_section("2. SNAPSHOT CON PRODUCTOS SIN STOCK")
+        # Snapshot exportado antes del filtro: incluye el producto agotado
+        raw_dir = os.path.join(tmp, "raw")
+        os.makedirs(raw_dir)
+        payloads = [export_vectors.product_payload(row) for row in rows]
+        save_snapshot(
+            os.path.join(raw_dir, f"{LOCAL_ID}.npz"),
+            {"faqs": ([], []), "products": (embeddings, payloads)},
+            "check",
+        )
+        for quantization in QUANTIZATIONS:
+            for label, snapshot_dir in (("raw", raw_dir), ("export", export_dir)):
+                ids = [hit["id"] for hit in local_search(snapshot_dir, quantization, query)]
+                all_ok &= check(
+                    bool(ids) and "AGOTADO" not in ids,
+                    f"{quantization} ({label}): AGOTADO excluido",
+                    f"resultados: {ids}",
+                )
+
+    print(f"\n{check_mark(all_ok)} {'Todos los chequeos pasaron' if all_ok else 'Hay chequeos fallidos'}")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Chequeo de normalización de texto - DOLMEN RAG MVP
+Ejecutar: python scripts/check_text_normalization.py
+
+Valida que el stemming liviano de text_normalization.py (usado por los
+índices de FAQs/catálogo y por BM25) da el mismo token para:
+1. Singular y plural ("gris" / "grises", "pared" / "paredes", ...)
+2. Masculino y femenino ("rojo" / "roja")
+3. Acentos y mayúsculas ("Tubería" / "tuberias")
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from text_normalization import normalize_tokens, stem  # noqa: E402
+
+# ANSI colors
+GREEN = '\033[92m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+SINGULAR_PLURAL = [
+    ("gris", "grises"),
+    ("pais", "paises"),
+    ("interes", "intereses"),
+    ("mes", "meses"),
+    ("gas", "gases"),
+    ("pared", "paredes"),
+    ("color", "colores"),
+    ("luz", "luces"),
+    ("bloque", "bloques"),
+    ("varilla", "varillas"),
+    ("tuberia", "tuberias"),
+    ("uso", "usos"),
+]
+
+SAME_TOKENS = [
+    ("rojo", "roja"),
+    ("rojo", "rojas"),
+    ("Tubería", "tuberias"),
+    ("Cemento GRIS", "cementos grises"),
+]
+
+
+def check_mark(passed):
+    return f"{GREEN}✅{RESET}" if passed else f"{RED}❌{RESET}"
+
+
+def print_section(title):
+    print(f"\n{BLUE}{'='*50}{RESET}")
+    print(f"{BLUE}{title}{RESET}")
+    print(f"{BLUE}{'='*50}{RESET}")
+
+
+def main():
+    all_ok = True
+
+    print_section("1. SINGULAR / PLURAL")
+    for singular, plural in SINGULAR_PLURAL:
+        passed = stem(singular) == stem(plural)
+        print(f"{check_mark(passed)} {singular} / {plural} → {stem(singular)} / {stem(plural)}")
+        all_ok &= passed
+
+    print_section("2. GÉNERO, ACENTOS Y MAYÚSCULAS")
+    for first, second in SAME_TOKENS:
+        tokens = normalize_tokens(first), normalize_tokens(second)
+        passed = tokens[0] == tokens[1]
+        print(f"{check_mark(passed)} {first!r} / {second!r} → {tokens[0]} / {tokens[1]}")
+        all_ok &= passed
+
+    print(f"\n{check_mark(all_ok)} {'Todos los chequeos pasaron' if all_ok else 'Hay chequeos fallidos'}")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Normalización de texto en español para el matching local (FAQs, catálogo, BM25).
+
+Se aplica igual al construir los índices y a cada consulta: minúsculas,
+acentos plegados ("tubería" → "tuberia"), puntuación fuera ("¿varillas?" →
+"varillas"), stopwords fuera y un stemming liviano que unifica plurales y
+género ("varillas" / "varilla" → "varill"). Las tablas y expresiones se
+compilan una sola vez al importar el módulo.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+# Letras latinas acentuadas → sin acento (incluye ñ → n y ü → u)
+_ACCENT_TABLE = {
+    code: unicodedata.normalize("NFKD", chr(code))[0]
+    for code in range(0x00C0, 0x0250)
+    if unicodedata.normalize("NFKD", chr(code))[0].isascii()
+    and unicodedata.normalize("NFKD", chr(code)) != chr(code)
+}
+
+# Palabras y códigos/medidas ("07x30x41", "3/8", "1.5"); el resto es puntuación
+_TOKEN = re.compile(r"[a-z0-9]+(?:[/.][a-z0-9]+)*")
+
+# Stopwords (ya sin acentos). No incluye negaciones ("sin", "no"): cambian
+# el sentido de la consulta. Se filtran antes del stemming, así que tampoco
+# incluye palabras de contenido con plural ("uso" / "usos" del catálogo).
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun cada
+como con contra cual cuales cuando cuanto cuanta cuantos cuantas de del desde
+donde dos e el ella ellas ello ellos en entre era eran es esa esas ese eso
+esos esta estan estas este esto estos fue fueron ha hace hacer han hasta hay
+la las le les lo los mas me mi mis mucho muy nos nosotros o otra otras otro
+otros para pero poco por porque puede pueden que quien se sea ser si sobre
+son su sus tal tambien te tengo tiene tienen todo todos tu tus u un una unas
+uno unos y ya yo
+""".split())
+
+_VOWELS = frozenset("aeiou")
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas y sin acentos."""
+    return text.lower().translate(_ACCENT_TABLE)
+
+
+def stem(token: str) -> str:
+    """
+    Stemming liviano: plural → singular ("paredes" → "pared", "luces" →
+    "luz", "bloques" → "bloque") y sin vocal final de género ("roja" /
+    "rojo" → "roj"). Tokens cortos o con dígitos (medidas) quedan igual.
+    Singular y plural dan el mismo stem también cuando el singular termina
+    en vocal + "s" ("gris" / "grises" → "gri").
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ces") and len(token) > 4:
+        token = token[:-3] + "z"
+    elif token.endswith("es") and len(token) > 4 and token[-3] not in _VOWELS:
+        token = token[:-2]
+    if len(token) > 3 and token.endswith("s") and token[-2] in _VOWELS:
+        token = token[:-1]
+    if len(token) > 3 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+@lru_cache(maxsize=8192)
+def normalize_tokens(text: str, drop_stopwords: bool = True) -> Tuple[str, ...]:
+    """
+    Tokens normalizados de un texto (memorizado: las consultas se repiten).
+
+    Args:
+        text: Texto libre (consulta o campo del índice)
+        drop_stopwords: Quitar stopwords
+
+    Returns:
+        Tokens sin acentos ni puntuación, con stemming liviano
+    """
+    tokens: List[str] = []
+    for token in _TOKEN.findall(fold_accents(text)):
+        if drop_stopwords and token in STOPWORDS:
+            continue
+        tokens.append(stem(token))
+    return tuple(tokens)
+
+
+def normalize_text(text: str, drop_stopwords: bool = True) -> str:
+    """`normalize_tokens` unidos por espacios (ej: para frases clave)."""
+    return " ".join(normalize_tokens(text, drop_stopwords))
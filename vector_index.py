@@ -0,0 +1,433 @@
+"""
+Índice vectorial en proceso (NumPy) cargado desde snapshots exportados.
+
+Cada local tiene un snapshot `<dir>/<local_id>.npz` con los embeddings de
+FAQs y de chunks de productos (ver export_vectors.py). Los vectores se
+guardan normalizados en float32, así la similitud coseno es un producto
+punto: búsqueda por fuerza bruta en microsegundos para el tamaño del
+catálogo, o particionada (IVF) para catálogos grandes.
+
+Con cuantización (float16/int8) la primera pasada recorre una copia compacta
+de los vectores y solo los mejores candidatos se re-puntúan en float32, leídos
+del snapshot mapeado en memoria: la RAM por local baja 2-4x.
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Tablas incluidas en cada snapshot
+SNAPSHOT_TABLES = ("faqs", "products")
+# Representaciones de la primera pasada de búsqueda
+QUANTIZATIONS = ("none", "float16", "int8")
+# Filas procesadas por bloque al cuantizar y al puntuar la primera pasada
+# (acota la memoria temporal al convertir a float32)
+BLOCK_ROWS = 8192
+
+
+def as_matrix(embeddings, rows: int) -> np.ndarray:
+    """Embeddings como matriz float32 (rows, dim); vacía si no hay filas."""
+    if rows == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.asarray(embeddings, dtype=np.float32).reshape(rows, -1)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza filas a norma 1 en float32 (las filas nulas quedan en cero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_rows(matrix: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Cuantiza filas normalizadas.
+
+    Args:
+        matrix: Matriz float32 (n, dim) con filas de norma 1
+        quantization: "float16" o "int8" (escala simétrica por fila)
+
+    Returns:
+        (códigos, escalas por fila o None); la fila original es ~códigos * escala
+    """
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class VectorIndex:
+    """
+    Índice de vectores normalizados con búsqueda por producto punto.
+
+    Con `n_lists > 0` (y suficientes vectores) agrupa los vectores en
+    particiones con k-means esférico y solo revisa las `n_probe` particiones
+    más cercanas a la consulta (IVF); si no, busca por fuerza bruta.
+
+    Con `quantization` o `first_pass_dims` la búsqueda es en dos pasadas: la
+    primera sobre códigos float16/int8 (opcionalmente solo las primeras
+    `first_pass_dims` dimensiones, renormalizadas: los embeddings
+    text-embedding-3 admiten truncarse así) elige `top_k * rescore_factor`
+    candidatos, y la segunda los re-puntúa con los vectores float32 exactos.
+    """
+
+    # Iteraciones de k-means al construir las particiones
+    KMEANS_ITERATIONS = 10
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        payloads: Sequence[Dict],
+        n_lists: int = 0,
+        n_probe: int = 4,
+        seed: int = 0,
+        quantization: str = "none",
+        first_pass_dims: Optional[int] = None,
+        rescore_factor: int = 4,
+        normalized: bool = False,
+    ):
+        """
+        Args:
+            embeddings: Matriz (n, dim)
+            payloads: Un diccionario por fila (lo que retorna la búsqueda)
+            n_lists: Particiones IVF (0 = fuerza bruta)
+            n_probe: Particiones revisadas por consulta con IVF
+            seed: Semilla de k-means (construcción determinística)
+            quantization: "none", "float16" o "int8" (primera pasada)
+            first_pass_dims: Dimensiones usadas en la primera pasada (None = todas)
+            rescore_factor: Candidatos re-puntuados por resultado pedido
+            normalized: `embeddings` ya es float32 con filas de norma 1; se usa
+                tal cual, sin copiar (ej: un np.memmap del snapshot)
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Cuantización inválida: {quantization}")
+        matrix = as_matrix(embeddings, len(payloads))
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self._mapped = isinstance(embeddings, np.memmap)
+        self.payloads = list(payloads)
+        self.n_probe = n_probe
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        # Primera pasada compacta (None = búsqueda exacta directa sobre `matrix`)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.first_pass_dims = min(first_pass_dims or self.dim, self.dim)
+        if len(self.payloads) and (quantization != "none" or self.first_pass_dims < self.dim):
+            self._build_codes()
+        # Menos de ~2 vectores por partición no justifica IVF
+        if n_lists > 0 and len(self.payloads) >= 2 * n_lists:
+            self._build_ivf(n_lists, seed)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def resident_bytes(self) -> int:
+        """Memoria propia del índice (sin contar un `matrix` mapeado desde disco)."""
+        arrays = [self.codes, self.scales, self.centroids] + list(self.lists)
+        if not self._mapped:
+            arrays.append(self.matrix)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def _build_codes(self):
+        """Cuantiza los vectores (truncados a `first_pass_dims`) por bloques."""
+        dims = self.first_pass_dims
+        dtype = {"none": np.float32, "float16": np.float16, "int8": np.int8}[self.quantization]
+        self.codes = np.empty((len(self.matrix), dims), dtype=dtype)
+        if self.quantization == "int8":
+            self.scales = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), BLOCK_ROWS):
+            block = self.matrix[start:start + BLOCK_ROWS, :dims]
+            if dims < self.dim:
+                block = normalize_rows(block)
+            if self.quantization == "none":
+                self.codes[start:start + len(block)] = block
+                continue
+            codes, scales = quantize_rows(np.asarray(block, dtype=np.float32), self.quantization)
+            self.codes[start:start + len(block)] = codes
+            if scales is not None:
+                self.scales[start:start + len(block)] = scales
+
+    def _first_pass_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Similitud aproximada de la consulta con `rows` (None = todas las filas)."""
+        total = len(self.codes) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, BLOCK_ROWS):
+            if rows is None:
+                block = slice(start, start + BLOCK_ROWS)
+            else:
+                block = rows[start:start + BLOCK_ROWS]
+            partial = self.codes[block].astype(np.float32) @ query
+            if self.scales is not None:
+                partial *= self.scales[block]
+            scores[start:start + len(partial)] = partial
+        return scores
+
+    def _build_ivf(self, n_lists: int, seed: int):
+        """Particiona los vectores con k-means esférico."""
+        rng = np.random.default_rng(seed)
+        centroids = self.matrix[rng.choice(len(self.matrix), n_lists, replace=False)]
+        for _ in range(self.KMEANS_ITERATIONS):
+            assignments = np.argmax(self.matrix @ centroids.T, axis=1)
+            for idx in range(n_lists):
+                members = self.matrix[assignments == idx]
+                if len(members):
+                    centroids[idx] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        assignments = np.argmax(self.matrix @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignments == idx) for idx in range(n_lists)]
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        threshold: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Vecinos más cercanos por similitud coseno.
+
+        Args:
+            query: Embedding de la consulta (no hace falta normalizarlo)
+            top_k: Máximo de resultados
+            threshold: Similitud mínima
+
+        Returns:
+            Lista de (fila, similitud) ordenada de mayor a menor
+        """
+        if not self.payloads or top_k <= 0:
+            return []
+        vector = normalize_rows(np.asarray(query, dtype=np.float32))
+        if vector.shape[-1] != self.dim:
+            raise ValueError(f"Dimensión de consulta {vector.shape[-1]} != {self.dim}")
+
+        if self.centroids is None:
+            candidates = None
+        else:
+            probe = np.argsort(-(self.centroids @ vector))[:self.n_probe]
+            candidates = np.concatenate([self.lists[idx] for idx in probe])
+
+        if self.codes is None:
+            scores = self.matrix @ vector if candidates is None else self.matrix[candidates] @ vector
+        else:
+            # Primera pasada compacta; los mejores candidatos se re-puntúan en float32
+            first = normalize_rows(vector[:self.first_pass_dims])
+            approx = self._first_pass_scores(first, candidates)
+            shortlist = _top_rows(approx, top_k * self.rescore_factor)
+            if candidates is not None:
+                shortlist = candidates[shortlist]
+            # Lectura en orden de fila (secuencial si `matrix` está en disco)
+            candidates = np.sort(shortlist)
+            scores = self.matrix[candidates] @ vector
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        best = _top_rows(scores, k)
+        best_scores = scores[best]
+        # Orden determinístico: mayor similitud y, a igualdad, menor fila
+        rows = best if candidates is None else candidates[best]
+        order = np.lexsort((rows, -best_scores))
+        results = [(int(rows[i]), float(best_scores[i])) for i in order]
+        if threshold is not None:
+            results = [(row, score) for row, score in results if score >= threshold]
+        return results
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Posiciones de los `k` puntajes más altos (sin ordenar)."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+@dataclass
+class VectorSnapshot:
+    """Índices de un local cargados desde un snapshot."""
+    faqs: VectorIndex
+    products: VectorIndex
+    model: str
+    exported_at: str
+
+
+def save_snapshot(
+    path: str,
+    tables: Dict[str, Tuple[List[List[float]], List[Dict]]],
+    model: str,
+):
+    """
+    Guarda un snapshot de un local (escritura atómica).
+
+    Args:
+        path: Archivo .npz de destino
+        tables: {"faqs"|"products": (embeddings, payloads)}
+        model: Modelo de embeddings con que se generaron los vectores
+    """
+    arrays = {
+        "model": np.array(model),
+        "exported_at": np.array(time.strftime("%Y-%m-%dT%H:%M:%S")),
+    }
+    for table in SNAPSHOT_TABLES:
+        embeddings, payloads = tables.get(table, ([], []))
+        arrays[f"{table}_embeddings"] = normalize_rows(as_matrix(embeddings, len(payloads)))
+        arrays[f"{table}_payloads"] = np.array(json.dumps(payloads, ensure_ascii=False))
+
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _mmap_member(path: str, name: str) -> Optional[np.ndarray]:
+    """
+    Mapea en memoria (solo lectura) un arreglo de un .npz sin comprimir, sin
+    leerlo a RAM: np.load ignora `mmap_mode` en archivos .npz. None si el
+    miembro está comprimido o no es mapeable.
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as handle:
+        # Encabezado local del zip: 30 bytes + nombre + campo extra
+        handle.seek(info.header_offset)
+        header = handle.read(30)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        handle.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(handle)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+        offset = handle.tell()
+    if dtype.hasobject or 0 in shape:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape, offset=offset,
+                     order="F" if fortran_order else "C")
+
+
+def load_snapshot(
+    path: str,
+    n_lists: int = 0,
+    n_probe: int = 4,
+    quantization: str = "none",
+    first_pass_dims: Optional[int] = None,
+    rescore_factor: int = 4,
+) -> VectorSnapshot:
+    """
+    Carga un snapshot y construye sus índices.
+
+    Con búsqueda en dos pasadas (`quantization` o `first_pass_dims`) los
+    vectores float32 no se cargan a RAM: se mapean desde el archivo y solo
+    se leen las filas candidatas al re-puntuar.
+    """
+    two_pass = quantization != "none" or bool(first_pass_dims)
+    with np.load(path, allow_pickle=False) as data:
+        indexes = {}
+        for table in SNAPSHOT_TABLES:
+            name = f"{table}_embeddings"
+            embeddings = _mmap_member(path, name) if two_pass else None
+            indexes[table] = VectorIndex(
+                data[name] if embeddings is None else embeddings,
+                json.loads(str(data[f"{table}_payloads"])),
+                n_lists=n_lists,
+                n_probe=n_probe,
+                quantization=quantization,
+                first_pass_dims=first_pass_dims,
+                rescore_factor=rescore_factor,
+                # save_snapshot guarda los vectores ya normalizados
+                normalized=True,
+            )
+        return VectorSnapshot(
+            faqs=indexes["faqs"],
+            products=indexes["products"],
+            model=str(data["model"]),
+            exported_at=str(data["exported_at"]),
+        )
+
+
+class LocalVectorStore:
+    """
+    Snapshots por local_id leídos de un directorio, cargados al primer uso y
+    recargados cuando cambia el archivo (revisado como máximo cada
+    `check_interval` segundos).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        n_lists: int = 0,
+        n_probe: int = 4,
+        check_interval: float = 5.0,
+        quantization: str = "none",
+        first_pass_dims: Optional[int] = None,
+        rescore_factor: int = 4,
+    ):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Cuantización inválida: {quantization}")
+        self.directory = directory
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.check_interval = check_interval
+        self.quantization = quantization
+        self.first_pass_dims = first_pass_dims
+        self.rescore_factor = rescore_factor
+        # local_id → (snapshot o None, mtime, último chequeo)
+        self._snapshots: Dict[str, Tuple[Optional[VectorSnapshot], Optional[float], float]] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, local_id: str) -> Optional[str]:
+        """Archivo del snapshot de un local (None si el id no es un nombre de archivo válido)."""
+        if not re.fullmatch(r"[\w.-]+", local_id) or local_id.startswith("."):
+            return None
+        return os.path.join(self.directory, f"{local_id}.npz")
+
+    def get(self, local_id: str) -> Optional[VectorSnapshot]:
+        """Snapshot vigente de un local (None si no hay)."""
+        now = time.monotonic()
+        cached = self._snapshots.get(local_id)
+        if cached is not None and now - cached[2] < self.check_interval:
+            return cached[0]
+
+        with self._lock:
+            cached = self._snapshots.get(local_id)
+            if cached is not None and now - cached[2] < self.check_interval:
+                return cached[0]
+            snapshot, loaded_mtime = cached[:2] if cached else (None, None)
+            path = self.path_for(local_id)
+            try:
+                if path is None:
+                    raise OSError(f"local_id inválido: {local_id!r}")
+                mtime = os.path.getmtime(path)
+                if mtime != loaded_mtime:
+                    snapshot = load_snapshot(
+                        path,
+                        self.n_lists,
+                        self.n_probe,
+                        quantization=self.quantization,
+                        first_pass_dims=self.first_pass_dims,
+                        rescore_factor=self.rescore_factor,
+                    )
+                    loaded_mtime = mtime
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                # Sin archivo (o inválido): se conserva el snapshot anterior, si había
+                pass
+            self._snapshots[local_id] = (snapshot, loaded_mtime, now)
+            return snapshot